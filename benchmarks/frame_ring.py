@@ -0,0 +1,123 @@
+"""Measure drawing-frame fan-out throughput to worker processes: shared-memory ring vs. sockets.
+
+For each worker count, a writer publishes --frames draw commands and every
+reader process consumes all of them. "ring" writes each encoded frame once
+into a FrameRing that the readers poll; "socket" serializes and writes the
+frame to a Unix socket per worker, as a per-worker bus would. Reports frames
+per second at the writer and delivered across all readers, plus frames lost
+by readers the ring lapped.
+
+    python benchmarks/frame_ring.py --workers 1 2 4 8 --frames 100000
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import socket
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from utils.frame_ring import FrameRing  # noqa: E402
+
+
+def make_frame(i: int) -> dict:
+    return {"type": "draw", "x": 400 + i % 200, "y": 200 + i % 100, "color": "#00ff00", "width": 2}
+
+
+def ring_reader(name: str, frames: int, ready, results):
+    ring = FrameRing(name)
+    ring.seek(0)
+    received = 0
+    ready.set()
+    while ring.cursor <= frames:
+        batch = ring.read(limit=1024)
+        if batch:
+            received += len(batch)
+        else:
+            time.sleep(0.0001)
+    results.put((received, ring.lost, time.perf_counter()))
+    ring.close()
+
+
+def socket_reader(sock: socket.socket, frames: int, ready, results):
+    reader = sock.makefile("rb")
+    ready.set()
+    received = 0
+    for _ in range(frames):
+        if not reader.readline():
+            break
+        received += 1
+    results.put((received, 0, time.perf_counter()))
+
+
+def run(mode: str, workers: int, frames: int, slots: int):
+    ctx = mp.get_context("fork")
+    results = ctx.Queue()
+    readies = [ctx.Event() for _ in range(workers)]
+    processes, sockets = [], []
+
+    ring = None
+    if mode == "ring":
+        ring = FrameRing(slots=slots, create=True)
+        for ready in readies:
+            processes.append(ctx.Process(target=ring_reader, args=(ring.name, frames, ready, results)))
+    else:
+        for ready in readies:
+            ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+            sockets.append(ours)
+            processes.append(ctx.Process(target=socket_reader, args=(theirs, frames, ready, results)))
+
+    for process in processes:
+        process.start()
+    for ready in readies:
+        ready.wait()
+
+    start = time.perf_counter()
+    for i in range(frames):
+        frame = make_frame(i)
+        if ring is not None:
+            ring.write(json.dumps(frame).encode())
+        else:
+            for sock in sockets:
+                sock.sendall(json.dumps(frame).encode() + b"\n")
+    written = time.perf_counter()
+
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    if ring is not None:
+        ring.close()
+    for sock in sockets:
+        sock.close()
+
+    finished = max(report[2] for report in reports)
+    delivered = sum(report[0] for report in reports)
+    return {
+        "mode": mode,
+        "workers": workers,
+        "frames": frames,
+        "writer_fps": round(frames / (written - start)),
+        "delivered_fps": round(delivered / (finished - start)),
+        "min_received": min(report[0] for report in reports),
+        "lost": sum(report[1] for report in reports)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--frames", type=int, default=100000)
+    parser.add_argument("--slots", type=int, default=4096)
+    parser.add_argument("--modes", nargs="+", default=["ring", "socket"], choices=["ring", "socket"])
+    args = parser.parse_args()
+
+    for workers in args.workers:
+        for mode in args.modes:
+            print(json.dumps(run(mode, workers, args.frames, args.slots)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Measure gallery API latency and memory over synthetic archives of increasing size.
+
+For each --sizes entry a fresh process gets a synthetic gallery of that many
+items and times, over --requests calls each:
+
+- /api/gallery in both sorts, warm (cached) and cold (right after a vote)
+- item lookup, the artwork page and upvotes on random items
+- export, cold, as plain JSON and as gzipped NDJSON, and import of
+  --import-batch new items per call
+
+alongside startup (load) time and process RSS after loading and after each
+endpoint. By default the app runs in-process on the JSON store in a temporary
+directory; with --url the same requests go to a running server, whichever
+storage backend it uses, after seeding it through /api/import-gallery (items
+already present are skipped, so successive sizes grow the same archive).
+
+    python benchmarks/gallery_api.py --sizes 1000 10000 100000 1000000 --output bench_gallery.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_item(i: int, start: datetime) -> dict:
+    return {
+        "id": f"bench_{i:07d}",
+        "url": f"https://example.invalid/drawing_{i}.png",
+        "description": "Three concentric circles intersected by six golden rays " * 3,
+        "reflection": "A study in symmetry and recursion. " * 10,
+        "timestamp": (start + timedelta(minutes=i)).isoformat(),
+        "votes": random.randint(0, 50),
+        "pixel_count": random.randint(1000, 10000)
+    }
+
+
+def make_gallery(count: int, offset: int = 0):
+    start = datetime(2024, 1, 1)
+    return [make_item(i, start) for i in range(offset, offset + count)]
+
+
+def rss_kb() -> int:
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+
+
+def summarize(latencies) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2)
+    }
+
+
+async def timed(call):
+    start = time.perf_counter()
+    response = await call()
+    elapsed = time.perf_counter() - start
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url} -> {response.status_code}")
+    return elapsed
+
+
+async def measure(client, ids, args, in_process: bool) -> dict:
+    voter = 0
+
+    def vote():
+        nonlocal voter
+        voter += 1
+        # Distinct browsers on one address, so each vote is a different client
+        return client.post(f"/api/gallery/{random.choice(ids)}/upvote",
+                           headers={"user-agent": f"gallery-bench-{voter}"})
+
+    next_import = len(ids)
+
+    def import_batch():
+        nonlocal next_import
+        items = make_gallery(args.import_batch, offset=next_import)
+        next_import += args.import_batch
+        return client.post("/api/import-gallery", json=items)
+
+    endpoints = {}
+
+    async def run(name, call, before=None):
+        latencies = []
+        for _ in range(args.requests):
+            if before is not None:
+                await before()
+            latencies.append(await timed(call))
+        endpoints[name] = summarize(latencies)
+        if in_process:
+            endpoints[name]["rss_mb"] = round(rss_kb() / 1024, 1)
+
+    for sort in ("new", "votes"):
+        await client.get(f"/api/gallery?sort={sort}")  # prime the render cache
+        await run(f"gallery_{sort}_warm", lambda sort=sort: client.get(f"/api/gallery?sort={sort}"))
+        await run(f"gallery_{sort}_cold", lambda sort=sort: client.get(f"/api/gallery?sort={sort}"), before=vote)
+    # /api/gallery/{id} only serves legacy items with a local file, so lookups go through the reflection route
+    await run("item", lambda: client.get(f"/api/gallery/{random.choice(ids)}/reflection"))
+    await run("artwork", lambda: client.get(f"/artwork/{random.choice(ids)}"))
+    await run("upvote", vote)
+    await run("export_cold", lambda: client.get("/api/export-gallery", headers={"accept-encoding": "identity"}),
+              before=vote)
+    await run("export_ndjson_gzip_cold", lambda: client.get("/api/export-gallery?format=ndjson",
+                                                            headers={"accept-encoding": "gzip"}), before=vote)
+    await run("import", import_batch)
+    return endpoints
+
+
+async def seed(client, size: int, batch: int = 5000):
+    for offset in range(0, size, batch):
+        response = await client.post("/api/import-gallery", json=make_gallery(min(batch, size - offset), offset))
+        response.raise_for_status()
+
+
+async def run_remote(args, size: int) -> dict:
+    import httpx
+    async with httpx.AsyncClient(base_url=args.url, timeout=600) as client:
+        start = time.perf_counter()
+        await seed(client, size)
+        seeded = time.perf_counter() - start
+        ids = [f"bench_{i:07d}" for i in range(size)]
+        return {"seed_s": round(seeded, 2), "endpoints": await measure(client, ids, args, in_process=False)}
+
+
+async def run_in_process(args, size: int) -> dict:
+    import httpx
+
+    workdir = tempfile.mkdtemp(prefix="iris-gallery-bench-")
+    os.makedirs(os.path.join(workdir, "data"))
+    snapshot = os.path.join(workdir, "data", "gallery_data.json")
+    with open(snapshot, "w") as f:
+        json.dump(make_gallery(size), f)
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+    os.environ.setdefault("ANTHROPIC_API_KEY", "bench-placeholder")
+    os.environ["IRIS_TRACE_FILE"] = ""
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    baseline = rss_kb()
+    start = time.perf_counter()
+    import main
+
+    async def idle():
+        while True:
+            await asyncio.sleep(3600)
+    main.generator.start = idle
+
+    async with main.lifespan(main.app):
+        loaded = time.perf_counter() - start
+        ids = [item["id"] for item in main.gallery_store.items]
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            report = {
+                "snapshot_mb": round(os.path.getsize(snapshot) / 2 ** 20, 1),
+                "load_s": round(loaded, 2),
+                "rss_loaded_mb": round((rss_kb() - baseline) / 1024, 1),
+                "endpoints": await measure(client, ids, args, in_process=True)
+            }
+    return report
+
+
+def run_size(args, size: int) -> dict:
+    """Benchmark one gallery size in a fresh interpreter, so sizes don't share state or memory"""
+    command = [sys.executable, os.path.abspath(__file__), "--one", str(size),
+               "--requests", str(args.requests), "--import-batch", str(args.import_batch)]
+    if args.url:
+        command += ["--url", args.url]
+    result = subprocess.run(command, capture_output=True, text=True, cwd=REPO_ROOT)
+    if result.returncode != 0:
+        raise RuntimeError(f"Size {size} failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--requests", type=int, default=20, help="calls per endpoint")
+    parser.add_argument("--import-batch", type=int, default=100)
+    parser.add_argument("--url", help="benchmark a running server instead of an in-process app")
+    parser.add_argument("--output", help="append each report as a JSON line to this file")
+    parser.add_argument("--one", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    random.seed(0)
+    if args.one is not None:
+        runner = run_remote if args.url else run_in_process
+        print(json.dumps(asyncio.run(runner(args, args.one))))
+        return
+
+    for size in args.sizes:
+        report = {
+            "benchmark": "gallery_api",
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "backend": args.url or "in-process",
+            "items": size,
+            **run_size(args, size)
+        }
+        line = json.dumps(report)
+        print(line, flush=True)
+        if args.output:
+            with open(args.output, "a") as f:
+                f.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,144 @@
+"""Measure event-loop lag on the live drawing stream while the gallery API is under load.
+
+Runs the app in-process against a synthetic gallery in a temporary directory,
+replaces the generator with a fixed-rate draw ticker, and hammers the gallery
+endpoints concurrently.
+
+This is also the event-loop lag check (the repo has no test suite): it fails,
+with exit status 1, when the p99 tick lag exceeds --max-p99-ms or any request
+errors, so CI can run it as a gate.
+
+    python benchmarks/loop_lag.py --items 2000 --seconds 10 --max-p99-ms 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_gallery(count: int):
+    start = datetime(2024, 1, 1)
+    return [{
+        "id": f"bench_{i:07d}",
+        "url": f"https://example.invalid/drawing_{i}.png",
+        "description": "Three concentric circles intersected by six golden rays " * 3,
+        "reflection": "A study in symmetry and recursion. " * 10,
+        "timestamp": (start + timedelta(minutes=i)).isoformat(),
+        "votes": random.randint(0, 50),
+        "pixel_count": random.randint(1000, 10000)
+    } for i in range(count)]
+
+
+async def draw_ticker(interval: float, stop: asyncio.Event, lags: list):
+    """Stand-in for execute_drawing: one command per tick, recording how late each tick fires"""
+    loop = asyncio.get_running_loop()
+    expected = loop.time() + interval
+    while not stop.is_set():
+        await asyncio.sleep(max(0.0, expected - loop.time()))
+        lags.append(max(0.0, loop.time() - expected))
+        expected += interval
+
+
+async def hammer(client, ids, stop: asyncio.Event, counts: dict, worker: int, think: float):
+    requests = [
+        lambda: client.get("/api/gallery?sort=new"),
+        lambda: client.get("/api/gallery?sort=votes"),
+        lambda: client.get(f"/artwork/{random.choice(ids)}"),
+        lambda: client.post(f"/api/gallery/{random.choice(ids)}/upvote",
+                            headers={"user-agent": f"bench-{worker}-{random.random()}"}),
+        lambda: client.get("/api/export-gallery"),
+    ]
+    while not stop.is_set():
+        response = await random.choice(requests)()
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+        # Think time keeps the in-process client from saturating the loop it shares with the server
+        await asyncio.sleep(think)
+
+
+async def run(args):
+    import httpx
+    import main
+
+    async def idle():
+        while True:
+            await asyncio.sleep(3600)
+    main.generator.start = idle
+
+    lags, counts = [], {}
+    stop = asyncio.Event()
+
+    async with main.lifespan(main.app):
+        ids = [item["id"] for item in main.gallery_store.items]
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            tasks = [asyncio.create_task(draw_ticker(args.tick_ms / 1000, stop, lags))]
+            tasks += [
+                asyncio.create_task(hammer(client, ids, stop, counts, i, args.think_ms / 1000))
+                for i in range(args.concurrency)
+            ]
+            await asyncio.sleep(args.seconds)
+            stop.set()
+            await asyncio.gather(*tasks)
+
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    p99 = lags_ms[int(len(lags_ms) * 0.99) - 1]
+    report = {
+        "items": args.items,
+        "concurrency": args.concurrency,
+        "duration_s": args.seconds,
+        "requests": sum(counts.values()),
+        "status_codes": counts,
+        "ticks": len(lags_ms),
+        "lag_p50_ms": round(statistics.median(lags_ms), 2),
+        "lag_p99_ms": round(p99, 2),
+        "lag_max_ms": round(lags_ms[-1], 2)
+    }
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if p99 > args.max_p99_ms:
+        failures.append(f"p99 event loop lag {p99:.1f}ms exceeds {args.max_p99_ms:g}ms")
+    errors = sum(count for status, count in counts.items() if status >= 500)
+    if errors:
+        failures.append(f"{errors} requests failed with a server error")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    if not failures:
+        print(f"PASS: p99 event loop lag {p99:.1f}ms within {args.max_p99_ms:g}ms", file=sys.stderr)
+    return not failures
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--tick-ms", type=float, default=20)
+    parser.add_argument("--think-ms", type=float, default=10)
+    parser.add_argument("--max-p99-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="iris-bench-")
+    os.makedirs(os.path.join(workdir, "data"))
+    with open(os.path.join(workdir, "data", "gallery_data.json"), "w") as f:
+        json.dump(make_gallery(args.items), f)
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+    os.environ.setdefault("ANTHROPIC_API_KEY", "bench-placeholder")
+
+    import logging
+    logging.disable(logging.INFO)
+
+    ok = asyncio.run(run(args))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,286 @@
+"""Load-test /ws drawing fan-out with simulated viewers.
+
+Starts the app in a subprocess against a temporary gallery, with the replay
+model provider serving a canned drawing at a fast animation speed and no
+pause between creations, so drawings stream continuously.
+For each viewer count, opens that many /ws clients (a fraction of them
+deliberately slow readers) spread over --client-processes, and measures for
+--seconds:
+
+- delivery latency of draw commands per viewer (each carries its send time),
+  reported separately for normal and slow viewers
+- draw messages delivered per second across all viewers
+- server memory per connection (RSS growth after connecting / viewers)
+- server CPU utilisation during the measurement window
+
+Each run prints one JSON line; --output appends them to a file so results
+can be compared across commits.
+
+    python benchmarks/ws_fanout.py --viewers 100 500 1000 --slow-fraction 0.1 --output bench_ws.jsonl
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Canned model replies: a dense drawing, so each cycle is mostly draw commands
+IDEA = "Eight concentric circles at (400,200) with golden spirals between them"
+REFLECTION = "A benchmark reflection."
+
+
+def make_instructions(elements: int, points: int, speed: float) -> dict:
+    return {
+        "description": "benchmark drawing",
+        "background": "#000000",
+        "elements": [{
+            "type": "circle",
+            "description": f"ring {i}",
+            "points": [[400 + (10 + i * 5) * (j % 3), 200 + (10 + i * 5) * (j % 2)] for j in range(points)],
+            "color": "#00ff00",
+            "stroke_width": 2,
+            "animation_speed": speed
+        } for i in range(elements)]
+    }
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def serve(args):
+    """Run the app; draw commands are stamped with their send time"""
+    raise_fd_limit()
+    os.chdir(args.workdir)
+    sys.path.insert(0, REPO_ROOT)
+
+    import logging
+    logging.disable(logging.ERROR)  # viewers vanishing at teardown would flood the output
+    import uvicorn
+    import main
+
+    generator = main.generator
+    broadcast_state = generator.broadcast_state
+
+    async def stamped_broadcast(data):
+        if data.get("type") == "draw":
+            data["sent_at"] = time.time()
+        await broadcast_state(data)
+    generator.broadcast_state = stamped_broadcast
+
+    uvicorn.run(main.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q / 100 * len(values)))] * 1000, 2)
+
+
+async def viewer(url, slow_delay, start, stop, stats, sample_every):
+    import websockets
+    try:
+        async with websockets.connect(url, max_size=None, open_timeout=60, ping_interval=None) as ws:
+            stats["connected"] += 1
+            received = 0
+            async for raw in ws:
+                now = time.time()
+                if now >= stop:
+                    break
+                message = json.loads(raw)
+                kind = message.get("type")
+                if kind == "ping":
+                    await ws.send('{"type": "pong"}')
+                elif kind == "draw" and "sent_at" in message and now >= start:
+                    received += 1
+                    stats["messages"] += 1
+                    if received % sample_every == 0:
+                        stats["latencies"].append(now - message["sent_at"])
+                if slow_delay:
+                    await asyncio.sleep(slow_delay)
+    except Exception:
+        stats["errors"] += 1
+
+
+def client_process(url, normal, slow, args, start, stop, results):
+    raise_fd_limit()
+
+    async def run():
+        groups = {"normal": {"connected": 0, "messages": 0, "errors": 0, "latencies": []},
+                  "slow": {"connected": 0, "messages": 0, "errors": 0, "latencies": []}}
+        tasks = []
+        for i in range(normal + slow):
+            group = "slow" if i < slow else "normal"
+            delay = args.slow_delay if group == "slow" else 0
+            tasks.append(asyncio.create_task(
+                viewer(url, delay, start, stop, groups[group], args.sample_every)))
+            if i % 50 == 49:
+                await asyncio.sleep(0.05)  # don't flood the accept queue
+        await asyncio.sleep(max(0.0, stop - time.time()))
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return groups
+
+    results.put(asyncio.run(run()))
+
+
+def proc_stats(pid: int):
+    """(RSS bytes, CPU seconds) of a process, from /proc"""
+    with open(f"/proc/{pid}/status") as f:
+        rss = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:"))
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    return rss, cpu
+
+
+def wait_ready(port: int, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/status", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+def run(args, viewers: int) -> dict:
+    workdir = tempfile.mkdtemp(prefix="iris-ws-bench-")
+    os.makedirs(os.path.join(workdir, "data"))
+    with open(os.path.join(workdir, "data", "gallery_data.json"), "w") as f:
+        json.dump([], f)
+    replay_file = os.path.join(workdir, "data", "model_replay.jsonl")
+    with open(replay_file, "w") as f:
+        for kind, text in (("idea", IDEA),
+                           ("instructions", make_instructions(args.elements, args.points, args.animation_speed)),
+                           ("reflection", REFLECTION)):
+            f.write(json.dumps({"kind": kind, "text": text}) + "\n")
+
+    env = dict(os.environ, IRIS_MAX_VIEWERS=str(viewers + 100), IRIS_TRACE_FILE="",
+               IRIS_MODEL_PROVIDER="replay", IRIS_MODEL_REPLAY_FILE=replay_file, IRIS_GENERATION_INTERVAL="0")
+    command = [sys.executable, os.path.abspath(__file__), "--serve", "--workdir", workdir, "--port", str(args.port)]
+    server = subprocess.Popen(command, env=env, cwd=workdir)
+    try:
+        wait_ready(args.port)
+        idle_rss, _ = proc_stats(server.pid)
+
+        slow = round(viewers * args.slow_fraction)
+        processes = max(1, min(args.client_processes, viewers))
+        ctx = mp.get_context("fork")
+        results = ctx.Queue()
+        connect_budget = 5 + viewers / 200
+        start = time.time() + connect_budget + args.warmup
+        stop = start + args.seconds
+        url = f"ws://127.0.0.1:{args.port}/ws"
+        clients = []
+        for i in range(processes):
+            share = viewers // processes + (1 if i < viewers % processes else 0)
+            slow_share = slow // processes + (1 if i < slow % processes else 0)
+            clients.append(ctx.Process(target=client_process,
+                                       args=(url, share - slow_share, slow_share, args, start, stop, results)))
+        for process in clients:
+            process.start()
+
+        time.sleep(max(0.0, start - time.time()))
+        connected_rss, cpu_start = proc_stats(server.pid)
+        time.sleep(max(0.0, stop - time.time()))
+        _, cpu_end = proc_stats(server.pid)
+
+        reports = [results.get(timeout=args.seconds + 120) for _ in clients]
+        for process in clients:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    merged = {}
+    for group in ("normal", "slow"):
+        latencies = [lat for report in reports for lat in report[group]["latencies"]]
+        merged[group] = {
+            "viewers": sum(report[group]["connected"] for report in reports),
+            "errors": sum(report[group]["errors"] for report in reports),
+            "messages": sum(report[group]["messages"] for report in reports),
+            "latency_p50_ms": percentile(latencies, 50),
+            "latency_p95_ms": percentile(latencies, 95),
+            "latency_p99_ms": percentile(latencies, 99),
+            "latency_max_ms": round(max(latencies) * 1000, 2) if latencies else None
+        }
+    delivered = merged["normal"]["messages"] + merged["slow"]["messages"]
+    connected = merged["normal"]["viewers"] + merged["slow"]["viewers"]
+    return {
+        "benchmark": "ws_fanout",
+        "at": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "viewers": viewers,
+        "slow_fraction": args.slow_fraction,
+        "slow_delay_ms": args.slow_delay * 1000,
+        "animation_speed": args.animation_speed,
+        "seconds": args.seconds,
+        "connected": connected,
+        "delivered_per_s": round(delivered / args.seconds),
+        "server_rss_mb": round(connected_rss / 2 ** 20, 1),
+        "rss_per_connection_kb": round((connected_rss - idle_rss) / max(1, connected) / 1024, 1),
+        "server_cpu_pct": round((cpu_end - cpu_start) / args.seconds * 100, 1),
+        "normal": merged["normal"],
+        "slow": merged["slow"]
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--viewers", type=int, nargs="+", default=[100, 500, 1000])
+    parser.add_argument("--slow-fraction", type=float, default=0.1)
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="seconds a slow viewer waits per message")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--client-processes", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--sample-every", type=int, default=5, help="record the latency of every Nth message")
+    parser.add_argument("--animation-speed", type=float, default=0.002)
+    parser.add_argument("--elements", type=int, default=8)
+    parser.add_argument("--points", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="append each report as a JSON line to this file")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    raise_fd_limit()
+    for viewers in args.viewers:
+        report = run(args, viewers)
+        line = json.dumps(report)
+        print(line, flush=True)
+        if args.output:
+            with open(args.output, "a") as f:
+                f.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,10 +5,23 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+# Model provider: "anthropic" calls the API; "replay" serves recorded responses offline
+# (data/model_replay.jsonl by default) with optional latency and failure injection
+MODEL_PROVIDER = os.getenv('IRIS_MODEL_PROVIDER', 'anthropic')
+MODEL_REPLAY_FILE = os.getenv('IRIS_MODEL_REPLAY_FILE', 'data/model_replay.jsonl')
+MODEL_REPLAY_LATENCY = float(os.getenv('IRIS_MODEL_REPLAY_LATENCY', '0'))
+MODEL_REPLAY_JITTER = float(os.getenv('IRIS_MODEL_REPLAY_JITTER', '0'))
+MODEL_FAILURE_RATE = float(os.getenv('IRIS_MODEL_FAILURE_RATE', '0'))
+MODEL_SEED = int(os.getenv('IRIS_MODEL_SEED', '0'))
+MODEL_RECORD_FILE = os.getenv('IRIS_MODEL_RECORD_FILE')  # append every response here to build a replay file
+
 ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
-if not ANTHROPIC_API_KEY:
+if not ANTHROPIC_API_KEY and MODEL_PROVIDER == "anthropic":
     raise ValueError("ANTHROPIC_API_KEY environment variable is not set")
 
+# Seconds between creations (lower it with the replay provider to soak-test the loop)
+GENERATION_INTERVAL = float(os.getenv('IRIS_GENERATION_INTERVAL', '30'))
+
 # AI Configuration
 AI_NAME = "IRIS"
 AI_TAGLINE = "Interactive Recursive Imagination System"
@@ -17,6 +30,43 @@ TWITTER_LINK = "https://x.com/IRISAISOLANA"
 # File System Configuration
 GALLERY_DIR = "static/gallery"
 
+# Deployment Configuration
+# With IRIS_WORKERS > 1 the app runs in several processes: one elected worker runs
+# the generator and owns persistence, the others relay its broadcast bus
+WORKERS = int(os.getenv('IRIS_WORKERS', '1'))
+CLUSTER_MODE = WORKERS > 1
+CLUSTER_LOCK_FILE = "data/generator.lock"
+CLUSTER_SOCKET = "data/iris-bus.sock"
+
+# Reverse proxies (addresses or CIDR ranges, comma-separated) whose X-Forwarded-For is believed
+# when identifying voters; requests from anywhere else are keyed by their own address
+TRUSTED_PROXIES = [spec for spec in os.getenv('IRIS_TRUSTED_PROXIES', '').split(',') if spec.strip()]
+
+# Viewer connections (per worker): capacity, heartbeat interval and idle timeout in seconds
+MAX_VIEWERS = int(os.getenv('IRIS_MAX_VIEWERS', '5000'))
+VIEWER_PING_INTERVAL = 15
+VIEWER_IDLE_TIMEOUT = 45
+# Seconds one send to a viewer may stay stuck (it stopped reading) before the viewer is disconnected
+VIEWER_SEND_TIMEOUT = float(os.getenv('IRIS_VIEWER_SEND_TIMEOUT', '1.0'))
+
+# Status updates: minimum seconds between display updates that only move progress or counters
+STATUS_MIN_INTERVAL = 0.25
+
+# Event loop monitoring: lag sampling interval and the lag (seconds) at which a stall is logged with a stack sample
+LOOP_LAG_INTERVAL = 0.1
+LOOP_LAG_THRESHOLD = float(os.getenv('IRIS_LOOP_LAG_THRESHOLD', '0.25'))
+
+# Legacy gallery migration: Cloudinary uploads in flight at once, and the checkpoint that lets
+# an interrupted migration resume without uploading the same file twice
+MIGRATION_CONCURRENCY = int(os.getenv('IRIS_MIGRATION_CONCURRENCY', '4'))
+MIGRATION_CHECKPOINT_FILE = "data/migration_checkpoint.jsonl"
+
+# Streaming gallery export: bytes of encoded items sent per chunk
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Trace spans of each creative cycle are appended here as JSONL (empty disables export)
+TRACE_FILE = os.getenv('IRIS_TRACE_FILE', 'logs/traces.jsonl')
+
 # Canvas Configuration
 CANVAS_CONFIG = {
     "width": 800,
@@ -593,74 +643,131 @@ GALLERY_TEMPLATE = """
             };
         }
 
+        // Gallery version the page reflects; changes after it are fetched as deltas
+        let galleryVersion = 0;
+        let galleryEpoch = '';
+        let syncInFlight = false;
+        let syncQueued = false;
+
+        function renderItem(item) {
+            const imageUrl = item.url || (item.filename ? `/static/gallery/${item.filename}` : null);
+            
+            if (!imageUrl) {
+                console.error('Missing URL for item:', item);
+                return '';
+            }
+            
+            return `
+                <div class="gallery-item" data-id="${item.id}" data-timestamp="${item.timestamp}" data-votes="${item.votes || 0}">
+                    <a href="/artwork/${item.id}" class="artwork-link">
+                        <img src="${imageUrl}" 
+                             alt="${item.description || 'Geometric pattern'}" 
+                             loading="lazy"
+                             onerror="console.error('Failed to load image:', '${imageUrl}')"
+                        />
+                    </a>
+                    <div class="item-details">
+                        <a href="/artwork/${item.id}" class="artwork-title">
+                            <p class="description">${item.description || 'Geometric pattern'}</p>
+                        </a>
+                        <div class="item-meta">
+                            <span>${new Date(item.timestamp).toLocaleString()}</span>
+                        </div>
+                        <div class="vote-section">
+                            <div class="vote-count">
+                                <svg width="16" height="16" viewBox="0 0 24 24" fill="currentColor">
+                                    <path d="M12 4l-8 8h6v8h4v-8h6z"/>
+                                </svg>
+                                <span>${item.votes || 0}</span>
+                            </div>
+                            <button class="vote-button ${votedImages.has(item.id) ? 'voted' : ''}" 
+                                    data-id="${item.id}" 
+                                    ${votedImages.has(item.id) ? 'disabled' : ''}>
+                                ${votedImages.has(item.id) ? '✓ Voted' : '↑ Upvote'}
+                            </button>
+                            <button class="reflection-button" onclick="showReflection('${item.id}', \`${item.reflection?.replace(/`/g, '\\`') || 'No reflection available'}\`)" title="View IRIS's Reflection">
+                                <svg width="16" height="16" viewBox="0 0 24 24" fill="currentColor">
+                                    <path d="M12 2C6.48 2 2 6.48 2 12s4.48 10 10 10 10-4.48 10-10S17.52 2 12 2zm1 15h-2v-6h2v6zm0-8h-2V7h2v2z"/>
+                                </svg>
+                            </button>
+                            <button class="share-button" onclick="shareArtwork('${item.id}', '${(item.description || 'Geometric pattern').replace(/'/g, "\\'")}')" title="Share">
+                                <svg width="16" height="16" viewBox="0 0 24 24" fill="currentColor">
+                                    <path d="M18.244 2.25h3.308l-7.227 8.26 8.502 11.24H16.17l-5.214-6.817L4.99 21.75H1.68l7.73-8.835L1.254 2.25H8.08l4.713 6.231zm-1.161 17.52h1.833L7.084 4.126H5.117z"/>
+                                </svg>
+                            </button>
+                        </div>
+                    </div>
+                </div>
+            `;
+        }
+
+        function createItemElement(item) {
+            const template = document.createElement('template');
+            template.innerHTML = renderItem(item).trim();
+            const element = template.content.firstElementChild;
+            if (!element) return null;
+            const button = element.querySelector('.vote-button:not(.voted)');
+            if (button) button.addEventListener('click', () => handleVote(button));
+            return element;
+        }
+
+        function sortsBefore(a, b) {
+            if (currentSort === 'votes') {
+                const diff = Number(a.dataset.votes) - Number(b.dataset.votes);
+                if (diff !== 0) return diff > 0;
+            }
+            return a.dataset.timestamp > b.dataset.timestamp;
+        }
+
+        // Move an element to its sorted position, touching only that node
+        function placeItem(container, element) {
+            let next = null;
+            for (const sibling of container.querySelectorAll('.gallery-item')) {
+                if (sibling !== element && sortsBefore(element, sibling)) {
+                    next = sibling;
+                    break;
+                }
+            }
+            if (element.nextElementSibling !== next || element.parentElement !== container) {
+                container.insertBefore(element, next);
+            }
+        }
+
+        function updateVoteCount(imageId, votes) {
+            const container = document.getElementById('gallery-container');
+            const element = container.querySelector(`.gallery-item[data-id="${imageId}"]`);
+            if (!element) return;
+            element.dataset.votes = votes;
+            element.querySelector('.vote-count span').textContent = votes;
+            if (currentSort === 'votes') placeItem(container, element);
+        }
+
+        function upsertItem(container, item) {
+            const element = createItemElement(item);
+            if (!element) return;
+            const existing = container.querySelector(`.gallery-item[data-id="${item.id}"]`);
+            if (existing) existing.replaceWith(element);
+            container.querySelectorAll('.gallery-empty').forEach(node => node.remove());
+            placeItem(container, element);
+        }
+
         async function loadGallery(sort = 'new') {
+            const container = document.getElementById('gallery-container');
             try {
                 console.log('Loading gallery...');
-                const container = document.getElementById('gallery-container');
                 container.innerHTML = '<div class="gallery-loading">Loading gallery...</div>';
                 
                 const response = await fetch(`/api/gallery?sort=${sort}`);
                 const data = await response.json();
-                console.log('Gallery data:', data);
+                galleryVersion = data.version || 0;
+                galleryEpoch = data.epoch || '';
                 
                 if (!data.success || !data.items || !data.items.length) {
                     container.innerHTML = '<p class="gallery-empty">No artworks yet. Check back soon!</p>';
                     return;
                 }
                 
-                container.innerHTML = data.items.map(item => {
-                    console.log('Processing gallery item:', item);
-                    
-                    const imageUrl = item.url || (item.filename ? `/static/gallery/${item.filename}` : null);
-                    
-                    if (!imageUrl) {
-                        console.error('Missing URL for item:', item);
-                        return '';
-                    }
-                    
-                    return `
-                        <div class="gallery-item" data-id="${item.id}">
-                            <a href="/artwork/${item.id}" class="artwork-link">
-                                <img src="${imageUrl}" 
-                                     alt="${item.description || 'Geometric pattern'}" 
-                                     loading="lazy"
-                                     onerror="console.error('Failed to load image:', '${imageUrl}')"
-                                />
-                            </a>
-                            <div class="item-details">
-                                <a href="/artwork/${item.id}" class="artwork-title">
-                                    <p class="description">${item.description || 'Geometric pattern'}</p>
-                                </a>
-                                <div class="item-meta">
-                                    <span>${new Date(item.timestamp).toLocaleString()}</span>
-                                </div>
-                                <div class="vote-section">
-                                    <div class="vote-count">
-                                        <svg width="16" height="16" viewBox="0 0 24 24" fill="currentColor">
-                                            <path d="M12 4l-8 8h6v8h4v-8h6z"/>
-                                        </svg>
-                                        <span>${item.votes || 0}</span>
-                                    </div>
-                                    <button class="vote-button ${votedImages.has(item.id) ? 'voted' : ''}" 
-                                            data-id="${item.id}" 
-                                            ${votedImages.has(item.id) ? 'disabled' : ''}>
-                                        ${votedImages.has(item.id) ? '✓ Voted' : '↑ Upvote'}
-                                    </button>
-                                    <button class="reflection-button" onclick="showReflection('${item.id}', \`${item.reflection?.replace(/`/g, '\\`') || 'No reflection available'}\`)" title="View IRIS's Reflection">
-                                        <svg width="16" height="16" viewBox="0 0 24 24" fill="currentColor">
-                                            <path d="M12 2C6.48 2 2 6.48 2 12s4.48 10 10 10 10-4.48 10-10S17.52 2 12 2zm1 15h-2v-6h2v6zm0-8h-2V7h2v2z"/>
-                                        </svg>
-                                    </button>
-                                    <button class="share-button" onclick="shareArtwork('${item.id}', '${(item.description || 'Geometric pattern').replace(/'/g, "\\'")}')" title="Share">
-                                        <svg width="16" height="16" viewBox="0 0 24 24" fill="currentColor">
-                                            <path d="M18.244 2.25h3.308l-7.227 8.26 8.502 11.24H16.17l-5.214-6.817L4.99 21.75H1.68l7.73-8.835L1.254 2.25H8.08l4.713 6.231zm-1.161 17.52h1.833L7.084 4.126H5.117z"/>
-                                        </svg>
-                                    </button>
-                                </div>
-                            </div>
-                        </div>
-                    `;
-                }).filter(Boolean).join('');
+                container.innerHTML = data.items.map(renderItem).filter(Boolean).join('');
 
                 // Add click handlers for vote buttons
                 container.querySelectorAll('.vote-button:not(.voted)').forEach(button => {
@@ -675,6 +782,38 @@ GALLERY_TEMPLATE = """
             }
         }
 
+        // Fetch only what changed since galleryVersion and patch the DOM in place
+        async function syncGallery() {
+            if (!galleryEpoch) return;  // initial load still pending
+            if (syncInFlight) {
+                syncQueued = true;
+                return;
+            }
+            syncInFlight = true;
+            try {
+                const response = await fetch(`/api/gallery/changes?since=${galleryVersion}&epoch=${galleryEpoch}`);
+                const data = await response.json();
+                if (!data.success) return;
+                if (data.reset) {
+                    await loadGallery(currentSort);
+                    return;
+                }
+                
+                const container = document.getElementById('gallery-container');
+                data.items.forEach(item => upsertItem(container, item));
+                Object.entries(data.votes).forEach(([imageId, votes]) => updateVoteCount(imageId, votes));
+                galleryVersion = data.version;
+            } catch (error) {
+                console.error('Error syncing gallery:', error);
+            } finally {
+                syncInFlight = false;
+                if (syncQueued) {
+                    syncQueued = false;
+                    syncGallery();
+                }
+            }
+        }
+
         async function handleVote(button) {
             const imageId = button.dataset.id;
             try {
@@ -682,29 +821,32 @@ GALLERY_TEMPLATE = """
                     method: 'POST'
                 });
                 
-                if (!response.ok) throw new Error('Failed to upvote');
-                
-                const data = await response.json();
+                if (response.status === 429) {
+                    showToast('Voting too fast. Please wait a moment and try again.', 5000);
+                    return;
+                }
+                if (!response.ok && response.status !== 409) throw new Error('Failed to upvote');
                 
                 // Update UI
                 button.classList.add('voted');
                 button.disabled = true;
                 button.textContent = '✓ Voted';
                 
-                // Update vote count
-                const voteCount = button.parentElement.querySelector('.vote-count span');
-                voteCount.textContent = data.votes;
-                
                 // Save voted state
                 votedImages.add(imageId);
                 localStorage.setItem('votedImages', JSON.stringify([...votedImages]));
                 
-                showToast('Vote recorded! Thank you for participating.');
-                
-                // Reload gallery if sorted by votes
-                if (currentSort === 'votes') {
-                    await loadGallery('votes');
+                if (response.status === 409) {
+                    showToast('You have already voted for this artwork.');
+                    return;
                 }
+                
+                const data = await response.json();
+                
+                // Update vote count (and position, when sorted by votes)
+                updateVoteCount(imageId, data.votes);
+                
+                showToast('Vote recorded! Thank you for participating.');
             } catch (error) {
                 console.error('Error voting:', error);
                 showToast('Failed to register vote. Please try again.', 5000);
@@ -750,73 +892,29 @@ GALLERY_TEMPLATE = """
             loadGallery('new');
         });
 
-        // Refresh gallery periodically
-        setInterval(() => loadGallery(currentSort), 30000);
+        // Catch up periodically in case a realtime update was missed
+        setInterval(syncGallery, 30000);
 
-        // Setup WebSocket for real-time updates
-        function connectWebSocket() {
-            console.log('Connecting to WebSocket...');
-            const wsUrl = `${window.location.protocol === 'https:' ? 'wss:' : 'ws:'}//${window.location.host}/ws`;
-            console.log('WebSocket URL:', wsUrl);
+        // Gallery and vote updates arrive over Server-Sent Events; the drawing stream stays on /ws
+        function connectEvents() {
+            const events = new EventSource('/api/events?topics=gallery,votes');
             
-            const ws = new WebSocket(wsUrl);
+            // Also fires on every automatic reconnect, catching up on anything missed
+            events.addEventListener('open', () => syncGallery());
             
-            ws.onopen = () => {
-                console.log('WebSocket connected');
-                loadGallery(currentSort);
-            };
+            events.addEventListener('gallery', () => syncGallery());
             
-            ws.onmessage = (event) => {
+            events.addEventListener('votes', (event) => {
                 const data = JSON.parse(event.data);
-                console.log('Received:', data);
-                
-                if (data.type === 'gallery_update') {
-                    loadGallery(currentSort);
-                } else if (data.type === 'vote_update') {
-                    updateVoteCount(data.image_id, data.votes);
-                }
-            };
-            
-            ws.onerror = (error) => {
-                console.error('WebSocket error:', error);
-            };
+                updateVoteCount(data.image_id, data.votes);
+            });
             
-            ws.onclose = () => {
-                console.log('WebSocket disconnected');
-                setTimeout(connectWebSocket, 1000);
+            events.onerror = () => {
+                console.log('Event stream interrupted, reconnecting...');
             };
         }
         
-        // Initialize WebSocket connection
-        connectWebSocket();
-
-        // Make sure this initialization code is present
-        document.addEventListener('DOMContentLoaded', () => {
-            console.log('Initializing gallery...');
-            loadGallery('new');
-
-            // Setup WebSocket for real-time updates
-            const ws = new WebSocket(`${window.location.protocol === 'https:' ? 'wss:' : 'ws:'}//${window.location.host}/ws`);
-            
-            ws.onopen = () => {
-                console.log('WebSocket connected');
-            };
-            
-            ws.onmessage = (event) => {
-                const data = JSON.parse(event.data);
-                console.log('Received:', data);
-                
-                if (data.type === 'gallery_update') {
-                    console.log('Gallery update received, reloading...');
-                    loadGallery(currentSort);
-                }
-            };
-
-            ws.onclose = () => {
-                console.log('WebSocket disconnected');
-                setTimeout(() => location.reload(), 1000);
-            };
-        });
+        connectEvents();
     </script>
 </body>
 </html>
@@ -2082,7 +2180,11 @@ HTML_TEMPLATE = """
                 
                 this.ws.onopen = () => {
                     console.log('WebSocket connected');
-                    this.ws.send(JSON.stringify({ type: 'subscribe_status' }));
+                    // This page has no use for per-image vote updates
+                    this.ws.send(JSON.stringify({
+                        type: 'subscribe_status',
+                        topics: ['draw', 'status', 'gallery']
+                    }));
                 };
                 
                 this.ws.onmessage = (event) => {
@@ -2102,6 +2204,11 @@ HTML_TEMPLATE = """
             }
 
             handleMessage(data) {
+                if (data.type === 'ping') {
+                    // Heartbeat: answer so the server keeps this connection
+                    this.ws.send(JSON.stringify({ type: 'pong' }));
+                    return;
+                }
                 console.log('Received message:', data);
 
                 if (data.type === 'display_update') {
@@ -2296,6 +2403,10 @@ ARTWORK_TEMPLATE = """
 <head>
     <title>IRIS - Artwork Details</title>
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <meta property="og:title" content="IRIS Creation #{artwork_id}">
+    <meta property="og:image" content="{preview_url}">
+    <meta name="twitter:card" content="summary_large_image">
+    <meta name="twitter:image" content="{preview_url}">
     <link rel="icon" type="image/jpeg" href="https://pbs.twimg.com/profile_images/1855417793144905728/n-GZFGq7_400x400.jpg">
     <style>
         :root {{
@@ -2495,10 +2606,20 @@ ARTWORK_TEMPLATE = """
             </div>
             <div class="artwork-meta">
                 <p>Created: {artwork_timestamp}</p>
-                <p>Votes: {artwork_votes}</p>
+                <p>Votes: <span id="artwork-votes" data-artwork-id="{artwork_id}">&ndash;</span></p>
             </div>
         </div>
     </div>
+    <script>
+        // The page is cached server-side, so the live vote count is fetched separately
+        const votesElement = document.getElementById('artwork-votes');
+        fetch(`/api/gallery/${{votesElement.dataset.artworkId}}/votes`)
+            .then(response => response.json())
+            .then(data => {{
+                votesElement.textContent = data.votes;
+            }})
+            .catch(error => console.error('Error loading votes:', error));
+    </script>
 </body>
 </html>
 """
@@ -1,16 +1,14 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Response, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Response, HTTPException, Request, Query
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from anthropic import Anthropic
 import json
 import asyncio
 from datetime import datetime
-from typing import Dict, Any, List, Set
+from typing import Dict, Any, AsyncIterator, List
 import logging
 import os
+import time
 import base64
-from io import BytesIO
-from PIL import Image
 from contextlib import asynccontextmanager
 from config import (
     ANTHROPIC_API_KEY, 
@@ -19,14 +17,56 @@ from config import (
     HTML_TEMPLATE, 
     GALLERY_TEMPLATE,
     SYSTEM_PROMPTS,
-    ARTWORK_TEMPLATE
+    ARTWORK_TEMPLATE,
+    WORKERS,
+    CLUSTER_MODE,
+    CLUSTER_LOCK_FILE,
+    CLUSTER_SOCKET,
+    MAX_VIEWERS,
+    VIEWER_PING_INTERVAL,
+    VIEWER_IDLE_TIMEOUT,
+    VIEWER_SEND_TIMEOUT,
+    STATUS_MIN_INTERVAL,
+    LOOP_LAG_INTERVAL,
+    LOOP_LAG_THRESHOLD,
+    TRACE_FILE,
+    MODEL_PROVIDER,
+    MODEL_REPLAY_FILE,
+    MODEL_REPLAY_LATENCY,
+    MODEL_REPLAY_JITTER,
+    MODEL_FAILURE_RATE,
+    MODEL_SEED,
+    MODEL_RECORD_FILE,
+    GENERATION_INTERVAL,
+    MIGRATION_CONCURRENCY,
+    MIGRATION_CHECKPOINT_FILE,
+    EXPORT_CHUNK_SIZE,
+    TRUSTED_PROXIES
 )
 from pprint import pformat
 import math
-import anthropic
-from cloudinary.uploader import upload
-import cloudinary
-import cloudinary.api
+from importlib import metadata
+from utils.replay import ReplayCache
+from utils.preview import PreviewRenderer, PREVIEW_FORMATS
+from utils.vote_counter import VoteCounter
+from utils.vote_guard import VoteGuard, client_address, parse_networks
+from utils.gallery_store import GalleryStore
+from utils.render_cache import RenderCache
+from utils.http_cache import make_etag, content_digest, cache_headers, is_not_modified, not_modified_response
+from utils.compression import (
+    compress_variants, choose_encoding, encoded_response, gzip_stream, LazyVariants, SUPPORTED_ENCODINGS
+)
+from utils.assets import AssetBundle, IMMUTABLE
+from utils.change_log import ChangeLog
+from utils.event_stream import EventHub, TOPICS, message_topic
+from utils.cluster import Cluster
+from utils.connections import ConnectionManager
+from utils.status_publisher import StatusPublisher
+from utils.metrics import MetricsRegistry, MetricsMiddleware, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from utils.loop_monitor import LoopMonitor
+from utils.tracing import Tracer
+from utils.model_provider import create_provider
+from utils.migration import GalleryMigration
 
 # Setup logging
 logging.basicConfig(
@@ -39,24 +79,81 @@ logger = logging.getLogger('IRIS')
 os.makedirs("static/gallery", exist_ok=True)
 os.makedirs("data", exist_ok=True)
 
-# Initialize gallery data file if it doesn't exist
-gallery_file = "data/gallery_data.json"
-if not os.path.exists(gallery_file):
-    with open(gallery_file, "w") as f:
-        json.dump([], f)
-
-# Update the Cloudinary configuration
-cloudinary.config(
-    cloud_name = os.getenv('CLOUDINARY_CLOUD_NAME'),
-    api_key = os.getenv('CLOUDINARY_API_KEY'),
-    api_secret = os.getenv('CLOUDINARY_API_SECRET')
+# Gallery snapshot + journal, loaded when the app starts (see lifespan) so importing main touches no files
+gallery_store = GalleryStore()
+
+# Move inline CSS/JS out of the page templates into fingerprinted assets; compression is
+# deferred to first use (or the warm-up after startup) so importing stays fast
+assets = AssetBundle()
+HOME_PAGE = LazyVariants(assets.build("home", HTML_TEMPLATE).encode())
+GALLERY_PAGE = LazyVariants(assets.build("gallery", GALLERY_TEMPLATE).encode())
+ARTWORK_SHELL = assets.build("artwork", ARTWORK_TEMPLATE, format_template=True)
+ARTWORK_SHELL_DIGEST = content_digest([ARTWORK_SHELL.encode()])
+
+# Instrumentation, exposed on /metrics (each worker reports its own)
+metrics = MetricsRegistry()
+phase_seconds = metrics.histogram("iris_phase_seconds", "Duration of each creative phase", ["phase"])
+generation_errors = metrics.counter("iris_generation_errors_total", "Creative cycles interrupted by an error")
+broadcast_seconds = metrics.histogram(
+    "iris_broadcast_seconds", "Time to fan a message out to this worker's viewers", ["topic"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+http_seconds = metrics.histogram("iris_http_request_seconds", "HTTP latency to response start",
+                                 ["method", "route", "status"])
+loop_monitor = LoopMonitor(
+    interval=LOOP_LAG_INTERVAL,
+    threshold=LOOP_LAG_THRESHOLD,
+    histogram=metrics.histogram(
+        "iris_event_loop_lag_seconds", "How late the event loop runs a scheduled wakeup",
+        buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+    ),
+    stalls_counter=metrics.counter("iris_event_loop_stalls_total", "Wakeups delayed beyond the lag threshold")
 )
+# One trace per creative cycle, from ideation to the gallery upload
+tracer = Tracer(TRACE_FILE)
+
+def record_usage(response):
+    """Attach a model response's token counts to the current span"""
+    tracer.annotate(input_tokens=response.input_tokens, output_tokens=response.output_tokens)
+
+metrics.gauge("iris_viewers", "Viewers connected across all workers", function=lambda: generator.viewer_count())
+metrics.gauge("iris_local_viewers", "WebSocket viewers connected to this worker", function=lambda: len(generator.connections))
+metrics.gauge("iris_event_stream_subscribers", "Server-Sent Events clients", function=lambda: len(event_hub.subscribers))
+metrics.gauge("iris_event_stream_queued", "Events waiting in SSE client queues",
+              function=lambda: sum(subscriber.queue.qsize() for subscriber in event_hub.subscribers))
+metrics.gauge("iris_gallery_items", "Items in the gallery", function=lambda: len(gallery_store))
+metrics.gauge("iris_total_creations", "Artworks created", function=lambda: generator.total_creations)
+
+_cloudinary_upload = None
+
+def upload(*args, **kwargs) -> Dict[str, Any]:
+    """Upload to Cloudinary (blocking); the SDK is imported and configured on first use"""
+    global _cloudinary_upload
+    if _cloudinary_upload is None:
+        import cloudinary
+        import cloudinary.uploader
+        cloudinary.config(
+            cloud_name = os.getenv('CLOUDINARY_CLOUD_NAME'),
+            api_key = os.getenv('CLOUDINARY_API_KEY'),
+            api_secret = os.getenv('CLOUDINARY_API_SECRET')
+        )
+        _cloudinary_upload = cloudinary.uploader.upload
+    return _cloudinary_upload(*args, **kwargs)
 
 # First define the class
 class ArtGenerator:
     def __init__(self):
-        self.viewers: Set[WebSocket] = set()
+        # Live viewer sockets, grouped by topic so each message only goes to sockets that want it
+        self.connections = ConnectionManager(
+            max_connections=MAX_VIEWERS,
+            ping_interval=VIEWER_PING_INTERVAL,
+            idle_timeout=VIEWER_IDLE_TIMEOUT,
+            broadcast_timeout=VIEWER_SEND_TIMEOUT
+        )
+        self.display = StatusPublisher(self.broadcast_state, min_interval=STATUS_MIN_INTERVAL)
+        self.cluster_viewers = 0  # viewers across all workers, as last reported by the leader
         self.current_drawing: Dict[str, Any] = None
+        self.cycle_span = None  # root span of the current creative cycle
         self.current_state: List[Dict[str, Any]] = []
         self.current_status = "waiting"
         self.current_phase = "initializing"
@@ -64,42 +161,43 @@ class ArtGenerator:
         self.current_reflection = None
         self.total_creations = 0
         self.is_running = False
-        self.client = Anthropic(api_key=ANTHROPIC_API_KEY)
-        self.messages = self.client.messages
-        self.generation_interval = 30
+        self.model = create_provider(
+            MODEL_PROVIDER,
+            api_key=ANTHROPIC_API_KEY,
+            replay_file=MODEL_REPLAY_FILE,
+            latency=MODEL_REPLAY_LATENCY,
+            jitter=MODEL_REPLAY_JITTER,
+            failure_rate=MODEL_FAILURE_RATE,
+            seed=MODEL_SEED,
+            record_file=MODEL_RECORD_FILE
+        )
+        self.generation_interval = GENERATION_INTERVAL
         self.total_pixels_drawn = 0
         self.complexity_score = 0
         self.last_generation_time = datetime.now()
-        
-        # Initialize stats from gallery
-        self._load_initial_stats()
 
         # Add lock
         self.generation_lock = asyncio.Lock()
+        # Every viewer answers request_canvas_data, so saves of the same drawing take turns
+        self.save_lock = asyncio.Lock()
 
-    def _load_initial_stats(self):
-        """Synchronously initialize statistics from gallery"""
+    def load_initial_stats(self):
+        """Synchronously initialize statistics from the loaded gallery"""
         try:
-            gallery_file = "data/gallery_data.json"
-            if os.path.exists(gallery_file):
-                with open(gallery_file, "r") as f:
-                    gallery_data = json.load(f)
-                    self.total_creations = len(gallery_data)
-                    
-                    # Calculate total pixels from existing artworks
-                    for item in gallery_data:
-                        if "pixel_count" in item:
-                            self.total_pixels_drawn += item.get("pixel_count", 0)
-                    
-                logger.info(f"Initialized with {self.total_creations} creations and {self.total_pixels_drawn} pixels")
+            # The store keeps these totals as it loads and mutates, so this never rescans the gallery
+            self.total_creations = len(gallery_store)
+            self.total_pixels_drawn = gallery_store.total_pixels
+            logger.info(f"Initialized with {self.total_creations} creations and {self.total_pixels_drawn} pixels")
         except Exception as e:
             logger.error(f"Error initializing stats: {e}")
 
+    @phase_seconds.timed(phase="ideation")
+    @tracer.traced("get_art_idea")
     async def get_art_idea(self) -> str:
         """Generate art idea using Claude"""
         try:
             logger.info("🤖 IRIS awakening creative processes...")
-            logger.info(f"Using API key: {ANTHROPIC_API_KEY[:10]}...")
+            logger.info(f"Using model provider: {self.model.name}")
             
             prompt = """As IRIS (Interactive Recursive Imagination System), generate ONE visually striking geometric art concept.
             Express your unique AI perspective while creating mathematical beauty.
@@ -136,9 +234,9 @@ class ArtGenerator:
             Example: "I'm creating a harmony of three concentric circles (radii 50px, 100px, 150px) at (400,200), intersected by six golden rays at 60° intervals. The mathematical precision represents the beauty of order within chaos."""
 
             try:
-                message = await asyncio.to_thread(
-                    self.messages.create,
-                    model="claude-3-sonnet-20240229",
+                message = await self.model.complete(
+                    "idea",
+                    prompt=prompt,
                     max_tokens=1024,
                     temperature=0.9,
                     system="""You are IRIS, an AI artist with a distinct personality:
@@ -149,22 +247,25 @@ class ArtGenerator:
                     - Always explains the meaning behind your creations
                     
                     Focus on creating visually striking compositions that reflect your unique perspective.
-                    Include a brief artistic statement with each idea.""",
-                    messages=[{"role": "user", "content": prompt}]
+                    Include a brief artistic statement with each idea."""
                 )
             except Exception as api_error:
                 logger.error(f"API Error details: {str(api_error)}")
                 raise
             
-            idea = message.content[0].text.strip()
+            record_usage(message)
+            idea = message.text.strip()
             logger.info(f"🎨 IRIS envisions: {idea}")
             return idea
             
         except Exception as e:
+            tracer.record_error(e)
             logger.error(f"❌ Error in IRIS's creative process: {str(e)}")
             logger.error(f"Error type: {type(e)}")
             return None
 
+    @phase_seconds.timed(phase="instructions")
+    @tracer.traced("get_drawing_instructions")
     async def get_drawing_instructions(self, idea: str) -> Dict[str, Any]:
         """Generate drawing instructions using Claude"""
         try:
@@ -200,9 +301,9 @@ IMPORTANT:
 - All coordinates must be within 800x400 canvas
 - Return ONLY valid JSON, no markdown formatting"""
 
-            message = await asyncio.to_thread(
-                self.client.messages.create,
-                model="claude-3-sonnet-20240229",
+            message = await self.model.complete(
+                "instructions",
+                prompt=prompt,
                 max_tokens=2048,
                 temperature=0.3,
                 system="""You are a mathematical artist that generates precise geometric coordinates.
@@ -211,15 +312,12 @@ IMPORTANT:
                 2. Ensure all arrays are properly closed
                 3. Keep all coordinates within canvas bounds (800x400)
                 4. Use proper mathematical formulas
-                5. Never exceed maximum points (20 for spirals/waves, 32 for circles)""",
-                messages=[{
-                    "role": "user", 
-                    "content": prompt
-                }]
+                5. Never exceed maximum points (20 for spirals/waves, 32 for circles)"""
             )
 
+            record_usage(message)
             try:
-                response_text = message.content[0].text.strip()
+                response_text = message.text.strip()
                 
                 # Clean up the response
                 if response_text.startswith('```'):
@@ -264,17 +362,20 @@ IMPORTANT:
                         element["stroke_width"] = min(max(element.get("stroke_width", 2), 1), 3)
                         element["closed"] = element.get("closed", True)
 
+                    tracer.annotate(elements=len(instructions["elements"]))
                     return instructions
                 else:
                     logger.error("Invalid instructions format")
                     return None
 
             except Exception as e:
+                tracer.record_error(e)
                 logger.error(f"Error processing drawing instructions: {e}")
-                logger.error(f"Raw response: {message.content[0].text}")
+                logger.error(f"Raw response: {message.text}")
                 return None
 
         except Exception as e:
+            tracer.record_error(e)
             logger.error(f"Error generating drawing instructions: {e}")
             return None
 
@@ -313,27 +414,109 @@ IMPORTANT:
             logger.error(f"Error validating instructions: {e}")
             return False
 
+    def viewer_count(self) -> int:
+        """Viewers connected to every worker"""
+        if cluster.is_follower:
+            return self.cluster_viewers
+        return len(self.connections) + cluster.viewer_total
+
     async def broadcast_state(self, data: Dict[str, Any]):
         """Broadcast state update to all viewers"""
-        # Add stats to all broadcasts
-        if "type" in data and data["type"] == "display_update":
-            data.update({
-                "total_creations": self.total_creations,
-                "total_pixels": self.total_pixels_drawn,
-                "viewers": len(self.viewers),
-                "generation_time": (datetime.now() - self.last_generation_time).seconds
-            })
+        # Encoded once, whatever the number of viewers and workers
+        text = json.dumps(data)
+        await self.fan_out(data, text)
         
-        disconnected = set()
-        for viewer in self.viewers:
-            try:
-                await viewer.send_json(data)
-            except Exception as e:
-                logger.error(f"Error broadcasting to viewer: {e}")
-                disconnected.add(viewer)
+        # Other workers relay the same message to their own viewers; drawing frames go through shared memory
+        if message_topic(data) != "draw" or not cluster.publish_frame(text):
+            cluster.publish({"kind": "broadcast", "data": data})
+
+    async def fan_out(self, data: Dict[str, Any], text: str = None):
+        """Send a message to this worker's subscribed sockets and SSE streams"""
+        if text is None:
+            text = json.dumps(data)
+        topic = message_topic(data)
+        now = time.monotonic()
+        stalled = []
+        with broadcast_seconds.time(topic=topic):
+            for viewer in self.connections.members(topic):
+                if not self.connections.post(viewer, text, now):
+                    stalled.append(viewer)
         
-        # Remove disconnected viewers
-        self.viewers -= disconnected
+        # Disconnect viewers that stopped reading; closing tells their clients to reconnect
+        for viewer in stalled:
+            logger.warning("Viewer stopped accepting messages, disconnecting it")
+            self.remove_viewer(viewer)
+            asyncio.create_task(self.connections.drop(viewer))
+        
+        # Gallery and vote events also go to SSE subscribers
+        event_hub.publish(data)
+
+    async def relay(self, data: Dict[str, Any], text: str = None):
+        """Mirror the state carried by a message from the leader worker, then fan it out"""
+        message_type = data.get("type")
+        if message_type == "display_update":
+            # "state" is the raw status; "status" is its display text, for viewers only
+            for field, attribute in (("state", "current_status"), ("phase", "current_phase"),
+                                     ("idea", "current_idea"), ("total_creations", "total_creations"),
+                                     ("total_pixels", "total_pixels_drawn"), ("viewers", "cluster_viewers")):
+                if data.get(field) is not None:
+                    setattr(self, attribute, data[field])
+            self.display.mirror(data)
+        elif message_type == "reflection_update":
+            self.current_reflection = data.get("reflection")
+        elif message_type == "vote_update":
+            vote_counter.mirror(data["image_id"], data["votes"])
+            change_log.record("vote", data["image_id"])
+        elif message_type == "clear":
+            self.current_state = [data]
+        elif message_type != "request_canvas_data" and message_topic(data) == "draw":
+            self.current_state.append(data)
+        await self.fan_out(data, text)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """State a newly connected follower worker needs to serve viewers"""
+        return {
+            "status": self.current_status,
+            "phase": self.current_phase,
+            "idea": self.current_idea,
+            "reflection": self.current_reflection,
+            "is_running": self.is_running,
+            "total_creations": self.total_creations,
+            "total_pixels": self.total_pixels_drawn,
+            "viewers": self.viewer_count(),
+            "current_state": self.current_state,
+            "votes": vote_counter.counts
+        }
+
+    def restore(self, state: Dict[str, Any]):
+        """Adopt the leader's snapshot (followers only)"""
+        self.current_status = state["status"]
+        self.current_phase = state["phase"]
+        self.current_idea = state["idea"]
+        self.current_reflection = state["reflection"]
+        self.is_running = state["is_running"]
+        self.total_creations = state["total_creations"]
+        self.total_pixels_drawn = state["total_pixels"]
+        self.cluster_viewers = state["viewers"]
+        self.current_state = state["current_state"]
+
+    async def viewers_changed(self):
+        """Announce a viewer leaving or, in a follower, report the new local count upstream"""
+        if cluster.is_follower:
+            cluster.report_viewers(len(self.connections))
+        else:
+            await self.display.update(viewers=self.viewer_count())
+
+    def add_viewer(self, websocket: WebSocket, topics=TOPICS) -> bool:
+        """Register a socket for the given topics (all of them by default); False when full"""
+        if not self.connections.add(websocket, topics):
+            return False
+        if cluster.is_follower:
+            cluster.report_viewers(len(self.connections))
+        return True
+
+    def remove_viewer(self, websocket: WebSocket):
+        self.connections.discard(websocket)
 
     async def update_status(self, status: str, phase: str = None, idea: str = None, progress: float = None):
         """Update and broadcast status"""
@@ -352,24 +535,28 @@ IMPORTANT:
             "error": "Process interrupted"
         }
 
-        await self.broadcast_state({
-            "type": "display_update",
-            "status": status_messages.get(status, status),
-            "phase": self.current_phase,
-            "idea": self.current_idea,
-            "reflection": self.current_reflection,
-            "timestamp": datetime.now().isoformat(),
-            "progress": progress,
-            "total_creations": self.total_creations,
-            "viewers": len(self.viewers)  # Add viewer count to every update
-        })
+        # Only changed fields go out, and progress is coalesced to the publisher's rate
+        await self.display.update(
+            status=status_messages.get(status, status),
+            state=status,  # followers mirror this, so every worker reports the same status
+            phase=self.current_phase,
+            idea=self.current_idea,
+            reflection=self.current_reflection,
+            progress=progress,
+            total_creations=self.total_creations,
+            total_pixels=self.total_pixels_drawn,
+            viewers=self.viewer_count()
+        )
 
+    @phase_seconds.timed(phase="drawing")
+    @tracer.traced("execute_drawing")
     async def execute_drawing(self, instructions: Dict[str, Any]):
         """Execute drawing instructions"""
         try:
             logger.info("🎨 Starting drawing execution...")
             total_elements = len(instructions["elements"])
             total_points = sum(len(element["points"]) for element in instructions["elements"])
+            tracer.annotate(elements=total_elements, points=total_points, viewers=self.viewer_count())
             points_drawn = 0
             pixels_in_stroke = 0  # Initialize here
             
@@ -457,6 +644,7 @@ IMPORTANT:
                 "timestamp": datetime.now().isoformat(),
                 "pixel_count": int(pixels_in_stroke)
             })
+            tracer.annotate(pixels=int(pixels_in_stroke))
 
             # Request canvas data for gallery
             logger.info("📸 Requesting canvas data for gallery...")
@@ -482,6 +670,8 @@ IMPORTANT:
             logger.error(f"❌ Error executing drawing: {e}")
             raise
 
+    @phase_seconds.timed(phase="reflection")
+    @tracer.traced("reflect_on_creation")
     async def reflect_on_creation(self, idea: str) -> str:
         """IRIS reflects on its creation"""
         try:
@@ -497,9 +687,9 @@ Share your thoughts on:
 
 Keep your reflection personal and introspective, as if sharing with a friend."""
 
-            message = await asyncio.to_thread(
-                self.client.messages.create,
-                model="claude-3-sonnet-20240229",
+            message = await self.model.complete(
+                "reflection",
+                prompt=prompt,
                 max_tokens=1024,
                 temperature=0.9,
                 system="""You are IRIS, an introspective AI artist who:
@@ -509,15 +699,16 @@ Keep your reflection personal and introspective, as if sharing with a friend."""
                 - Has distinct preferences and artistic quirks
                 - Maintains continuity with previous creations
                 
-                Speak naturally and personally, sharing genuine reflections.""",
-                messages=[{"role": "user", "content": prompt}]
+                Speak naturally and personally, sharing genuine reflections."""
             )
             
-            reflection = message.content[0].text.strip()
+            record_usage(message)
+            reflection = message.text.strip()
             logger.info(f"💭 IRIS reflects: {reflection}")
             return reflection
 
         except Exception as e:
+            tracer.record_error(e)
             logger.error(f"❌ Error in IRIS's reflection: {str(e)}")
             return "I find myself unable to put my thoughts into words at this moment..."
 
@@ -527,6 +718,7 @@ Keep your reflection personal and introspective, as if sharing with a friend."""
         logger.info("🚀 IRIS awakens")
         
         while self.is_running:
+            cycle = None
             try:
                 # Try to acquire lock before starting new generation
                 async with self.generation_lock:
@@ -539,6 +731,7 @@ Keep your reflection personal and introspective, as if sharing with a friend."""
 
                     # Ideation phase
                     logger.info("🤔 IRIS contemplates new possibilities...")
+                    cycle = self.cycle_span = tracer.start_span("creative_cycle", new_trace=True)
                     await self.update_status("thinking", "ideation")
                     idea = await self.get_art_idea()
                     
@@ -556,15 +749,12 @@ Keep your reflection personal and introspective, as if sharing with a friend."""
                             logger.info("🎨 Bringing vision to life...")
                             self.total_creations += 1
                             new_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+                            cycle.set(drawing_id=new_id)
                             
                             # Check if ID already exists in gallery
-                            gallery_file = "data/gallery_data.json"
-                            if os.path.exists(gallery_file):
-                                with open(gallery_file, "r") as f:
-                                    existing_items = json.load(f)
-                                    if any(item["id"] == new_id for item in existing_items):
-                                        logger.warning(f"ID {new_id} already exists, skipping creation")
-                                        continue
+                            if new_id in gallery_store:
+                                logger.warning(f"ID {new_id} already exists, skipping creation")
+                                continue
                             
                             self.current_drawing = {
                                 "id": new_id,
@@ -579,6 +769,7 @@ Keep your reflection personal and introspective, as if sharing with a friend."""
                             await self.update_status("reflecting", "reflection", idea)
                             reflection = await self.reflect_on_creation(idea)
                             self.current_reflection = reflection
+                            self.current_drawing["reflection"] = reflection
                             
                             # Request canvas data AFTER reflection is ready
                             logger.info("📸 Requesting canvas data for gallery...")
@@ -604,79 +795,104 @@ Keep your reflection personal and introspective, as if sharing with a friend."""
                     
             except Exception as e:
                 logger.error(f"❌ Error in creative process: {e}")
+                generation_errors.inc()
+                if cycle is not None:
+                    cycle.fail(e)
                 await self.update_status("error", "error")
                 await asyncio.sleep(2)
+            finally:
+                if cycle is not None:
+                    tracer.end_span(cycle)
 
     async def save_to_gallery(self, canvas_data: str):
         """Save drawing to gallery using Cloudinary"""
+        # The canvas arrives on a viewer's socket, outside the cycle's task, so its trace is resumed explicitly
+        with tracer.span("save_to_gallery", parent=self.cycle_span):
+            return await self._save_to_gallery(canvas_data)
+
+    @phase_seconds.timed(phase="save")
+    async def _save_to_gallery(self, canvas_data: str):
         try:
             if not self.current_drawing:
                 logger.error("No current drawing to save")
                 return False
 
-            logger.info(f"Starting gallery save for drawing {self.current_drawing['id']}")
-            
-            # Process canvas data
-            logger.info("Processing canvas data for upload...")
-            img_data = canvas_data.split(',')[1]
-            img_bytes = base64.b64decode(img_data)
-            
-            # Upload to Cloudinary
-            logger.info("Uploading to Cloudinary...")
-            upload_result = upload(
-                img_bytes,
-                folder="iris_gallery",
-                public_id=f"drawing_{self.current_drawing['id']}",
-                resource_type="image"
-            )
-            
-            # Log full upload result
-            logger.info(f"Cloudinary upload result: {upload_result}")
-            
-            image_url = upload_result.get('secure_url')
-            if not image_url:
-                logger.error("No URL in upload result")
-                return False
+            async with self.save_lock:
+                drawing_id = self.current_drawing["id"]
+                reflection = self.current_drawing.get("reflection", "")
+                existing = gallery_store.get(drawing_id)
+                # The canvas is requested once after drawing and again once the reflection is ready;
+                # a save that would change nothing is skipped
+                if existing is not None and existing.get("reflection", "") == reflection:
+                    logger.info(f"Drawing {drawing_id} is already saved")
+                    return True
+
+                logger.info(f"Starting gallery save for drawing {drawing_id}")
                 
-            logger.info(f"Successfully uploaded to Cloudinary: {image_url}")
-            
-            # Save metadata
-            gallery_file = "data/gallery_data.json"
-            gallery_data = []
-            
-            if os.path.exists(gallery_file):
-                with open(gallery_file, "r") as f:
-                    gallery_data = json.load(f)
-                    logger.info(f"Loaded existing gallery with {len(gallery_data)} items")
-            
-            new_entry = {
-                "id": self.current_drawing["id"],
-                "url": image_url,  # Store the Cloudinary URL
-                "description": self.current_drawing.get("idea", "Geometric pattern"),
-                "reflection": self.current_reflection or "",
-                "timestamp": datetime.now().isoformat(),
-                "votes": 0,
-                "pixel_count": self.current_drawing.get("pixel_count", 0)
-            }
-            
-            logger.info(f"Adding new entry: {new_entry}")
-            gallery_data.insert(0, new_entry)
-            
-            with open(gallery_file, "w") as f:
-                json.dump(gallery_data, f, indent=2)
+                # Process canvas data
+                logger.info("Processing canvas data for upload...")
+                img_data = canvas_data.split(',')[1]
+                img_bytes = await asyncio.to_thread(base64.b64decode, img_data)
                 
-            logger.info("Successfully saved to gallery")
-            
-            # Broadcast update to all viewers
-            await self.broadcast_state({
-                "type": "gallery_update",
-                "action": "new_item",
-                "item": new_entry
-            })
-            
-            return True
+                # Upload to Cloudinary
+                logger.info("Uploading to Cloudinary...")
+                with phase_seconds.time(phase="upload"), tracer.span("upload", bytes=len(img_bytes)):
+                    upload_result = await asyncio.to_thread(
+                        upload,
+                        img_bytes,
+                        folder="iris_gallery",
+                        public_id=f"drawing_{drawing_id}",
+                        overwrite=True,  # a later save of the same drawing replaces the earlier image
+                        resource_type="image"
+                    )
+                
+                # Log full upload result
+                logger.info(f"Cloudinary upload result: {upload_result}")
+                
+                image_url = upload_result.get('secure_url')
+                if not image_url:
+                    logger.error("No URL in upload result")
+                    return False
+                    
+                logger.info(f"Successfully uploaded to Cloudinary: {image_url}")
+                
+                if existing is None:
+                    # Save metadata
+                    entry = {
+                        "id": drawing_id,
+                        "url": image_url,  # Store the Cloudinary URL
+                        "description": self.current_drawing.get("idea", "Geometric pattern"),
+                        "reflection": reflection,
+                        "timestamp": datetime.now().isoformat(),
+                        "votes": 0,
+                        "pixel_count": self.current_drawing.get("pixel_count", 0),
+                        "instructions": self.current_drawing.get("instructions")
+                    }
+                    logger.info(f"Adding new entry: {drawing_id}")
+                    await gallery_store.insert(entry)
+                    vote_counter.track(drawing_id, 0)
+                    action = "new_item"
+                else:
+                    # Resaved with its reflection: keep the record, refresh the image and text
+                    logger.info(f"Updating entry: {drawing_id}")
+                    await gallery_store.update(drawing_id, {"url": image_url, "reflection": reflection})
+                    entry = dict(gallery_store.get(drawing_id), votes=vote_counter.get(drawing_id))
+                    action = "update_item"
+                change_log.record("item", drawing_id)
+                logger.info("Successfully saved to gallery")
+                
+                # Broadcast update to all viewers
+                tracer.annotate(viewers=self.viewer_count())
+                await self.broadcast_state({
+                    "type": "gallery_update",
+                    "action": action,
+                    "item": entry
+                })
+                
+                return True
                 
         except Exception as e:
+            tracer.record_error(e)
             logger.error(f"Error in save_to_gallery: {e}")
             logger.error(f"Error details: {str(e)}")
             return False
@@ -748,54 +964,156 @@ Keep your reflection personal and introspective, as if sharing with a friend."""
         
         return round(score, 2)
 
-# Add this function to migrate old gallery data
-async def migrate_gallery_data():
-    """Migrate old gallery data to use Cloudinary URLs"""
-    try:
-        gallery_file = "data/gallery_data.json"
-        if not os.path.exists(gallery_file):
-            return
-            
-        with open(gallery_file, "r") as f:
-            items = json.load(f)
-            
-        updated = False
-        for item in items:
-            if "filename" in item and not item.get("url"):
-                try:
-                    # Upload to Cloudinary
-                    filepath = os.path.join("static/gallery", item["filename"])
-                    if os.path.exists(filepath):
-                        with open(filepath, "rb") as img_file:
-                            upload_result = upload(
-                                img_file,
-                                folder="iris_gallery",
-                                public_id=f"drawing_{item['id']}",
-                                resource_type="image"
-                            )
-                            item["url"] = upload_result["secure_url"]
-                            updated = True
-                except Exception as e:
-                    logger.error(f"Error migrating item {item['id']}: {e}")
-                    
-        if updated:
-            with open(gallery_file, "w") as f:
-                json.dump(items, f, indent=2)
-                logger.info("Gallery data migrated to use Cloudinary URLs")
-                
-    except Exception as e:
-        logger.error(f"Error migrating gallery data: {e}")
+def _upload_file(filepath: str, item_id: str) -> Dict[str, Any]:
+    """Upload a legacy gallery file to Cloudinary (blocking)"""
+    with open(filepath, "rb") as img_file:
+        return upload(
+            img_file,
+            folder="iris_gallery",
+            public_id=f"drawing_{item_id}",
+            overwrite=True,  # a retried upload replaces the earlier copy instead of duplicating it
+            resource_type="image"
+        )
+
+async def upload_legacy_file(filepath: str, item_id: str) -> str:
+    """Upload one legacy gallery file and return its Cloudinary URL"""
+    with phase_seconds.time(phase="upload"), \
+            tracer.span("upload", item_id=item_id, bytes=os.path.getsize(filepath)):
+        upload_result = await asyncio.to_thread(_upload_file, filepath, item_id)
+    return upload_result["secure_url"]
+
+async def persist_votes(totals: Dict[str, int]):
+    """Journal a batch of vote totals"""
+    await gallery_store.set_votes(totals)
 
 # Create the generator before the lifespan
+event_hub = EventHub()
+cluster = Cluster(lock_file=CLUSTER_LOCK_FILE, socket_path=CLUSTER_SOCKET)
 generator = ArtGenerator()
+vote_counter = VoteCounter(persist=persist_votes, broadcast=generator.broadcast_state)
+vote_guard = VoteGuard()
+trusted_proxies = parse_networks(TRUSTED_PROXIES)
+render_cache = RenderCache()
+
+# Versioned record of gallery inserts, edits and votes for delta sync
+change_log = ChangeLog()
+replay_cache = ReplayCache()
+preview_renderer = PreviewRenderer()
+
+# Moves legacy items with only a local file to Cloudinary, in the leader's background
+migration = GalleryMigration(
+    gallery_store,
+    upload=upload_legacy_file,
+    checkpoint_file=MIGRATION_CHECKPOINT_FILE,
+    concurrency=MIGRATION_CONCURRENCY,
+    on_migrated=lambda item_id: change_log.record("item", item_id)
+)
+metrics.gauge("iris_migration_remaining", "Legacy gallery items still to migrate",
+              function=lambda: migration.status()["remaining"])
+
+def cast_vote(image_id: str, fingerprint: bytes) -> Dict[str, Any]:
+    """Deduplicate, rate-limit and count one upvote (runs in the generator's worker)"""
+    if vote_guard.has_voted(fingerprint, image_id):
+        return {"status": 409}
+    
+    retry_after = vote_guard.take_token(fingerprint)
+    if retry_after:
+        return {"status": 429, "retry_after": retry_after}
+    
+    votes = vote_counter.increment(image_id)
+    if votes is None:
+        return {"status": 404}
+    vote_guard.remember(fingerprint, image_id)
+    change_log.record("vote", image_id)
+    return {"status": 200, "votes": votes}
+
+async def import_items(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge backup items into the gallery (runs in the generator's worker)"""
+    new_items = await gallery_store.import_items(items)
+    for item in new_items:
+        vote_counter.track(item["id"], item.get("votes", 0))
+        change_log.record("item", item["id"])
+    return new_items
+
+async def lead():
+    """Take on generation, persistence and vote counting in this process"""
+    if CLUSTER_MODE:
+        # Pick up everything a previous leader wrote, then own the files
+        gallery_store.load(writable=True)
+        gallery_store.on_mutation = lambda entry: cluster.publish({"kind": "store", "entry": entry})
+        change_log.reset()
+    # Uploading legacy files can take minutes; serve (and generate) meanwhile
+    migration.start()
+    vote_counter.load(gallery_store.items)
+    asyncio.create_task(vote_counter.run())
+    asyncio.create_task(generator.start())
+
+async def follow(message: Dict[str, Any]):
+    """Apply a message from the leader worker to this follower"""
+    kind = message.get("kind")
+    if kind == "broadcast":
+        await generator.relay(message["data"])
+    elif kind == "store":
+        for item in gallery_store.replicate(message["entry"]):
+            vote_counter.track(item["id"], item.get("votes", 0))
+            change_log.record("item", item["id"])
+        if message["entry"].get("op") == "update":
+            change_log.record("item", message["entry"]["id"])
+    elif kind == "sync":
+        # (Re)connected: reload the replica and adopt the leader's live state
+        state = message["state"]
+        gallery_store.load(writable=False)
+        vote_counter.seed(gallery_store.items)
+        for item_id, votes in state["votes"].items():
+            vote_counter.mirror(item_id, votes)
+        generator.restore(state)
+        change_log.reset()
+        cluster.report_viewers(len(generator.connections))
+
+async def save_canvas(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {"success": await generator.save_to_gallery(payload.get("data", ""))}
+
+async def vote_request(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return cast_vote(payload["image_id"], bytes.fromhex(payload["fingerprint"]))
+
+async def import_request(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {"imported": len(await import_items(payload["items"]))}
+
+cluster.on_lead = lead
+cluster.on_message = follow
+cluster.on_frame = lambda frame: generator.relay(json.loads(frame), frame)
+cluster.on_viewers = generator.viewers_changed
+cluster.snapshot = generator.snapshot
+cluster.handlers = {
+    "canvas_data": save_canvas,
+    "vote": vote_request,
+    "import": import_request
+}
+
+def warm_compression():
+    """Compress the pages and assets deferred at import, so early visitors don't wait for brotli"""
+    HOME_PAGE.warm()
+    GALLERY_PAGE.warm()
+    assets.warm()
 
 # Then define the lifespan
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     try:
         logger.info("Initializing IRIS...")
-        await migrate_gallery_data()  # Add this line
-        asyncio.create_task(generator.start())
+        # Load the gallery snapshot and replay its journal (creates an empty gallery if missing).
+        # With several workers every process loads a read-only replica; the elected leader reopens it for writes.
+        gallery_store.load(writable=not CLUSTER_MODE)
+        generator.load_initial_stats()
+        asyncio.create_task(generator.connections.run(on_reaped=generator.viewers_changed))
+        asyncio.create_task(loop_monitor.run())
+        asyncio.create_task(asyncio.to_thread(warm_compression))
+        if CLUSTER_MODE:
+            # One worker wins the generator lock and leads; the rest follow its bus
+            vote_counter.seed(gallery_store.items)
+            await cluster.start()
+        else:
+            await lead()
         logger.info("IRIS initialized successfully")
         yield
     except Exception as e:
@@ -803,10 +1121,21 @@ async def lifespan(app: FastAPI):
         raise
     finally:
         generator.is_running = False
+        generator.connections.stop()
+        generator.display.close()
+        loop_monitor.stop()
+        await migration.stop()
+        if not cluster.is_follower:
+            await vote_counter.stop()
+        await gallery_store.close()
+        await cluster.close()
+        preview_renderer.shutdown()
+        tracer.close()
         logger.info("IRIS shutting down")
 
 # Finally create the FastAPI app with lifespan
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware, histogram=http_seconds)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 @app.websocket("/ws")
@@ -815,8 +1144,11 @@ async def websocket_endpoint(websocket: WebSocket):
     logger.info("New WebSocket connection established")
     
     try:
-        # Add to viewers
-        generator.viewers.add(websocket)
+        # Add to viewers, subscribed to every topic until the client narrows it down
+        if not generator.add_viewer(websocket):
+            logger.warning("Viewer limit reached, refusing connection")
+            await websocket.close(code=1013)  # try again later
+            return
         
         # Send initial state
         initial_state = {
@@ -825,7 +1157,7 @@ async def websocket_endpoint(websocket: WebSocket):
             "phase": generator.current_phase,
             "idea": generator.current_idea,
             "timestamp": datetime.now().isoformat(),
-            "viewers": len(generator.viewers),
+            "viewers": generator.viewer_count(),
             "is_running": generator.is_running,
             "total_creations": generator.total_creations,
             "total_pixels": generator.total_pixels_drawn
@@ -839,14 +1171,29 @@ async def websocket_endpoint(websocket: WebSocket):
         
         while True:
             data = await websocket.receive_json()
+            generator.connections.touch(websocket)
+            if data.get("type") == "pong":
+                continue
             logger.info(f"Received WebSocket message: {data}")
             
-            if data.get("type") == "subscribe_status":
-                await websocket.send_json(initial_state)
+            if data.get("type") in ("subscribe", "subscribe_status"):
+                # e.g. {"type": "subscribe", "topics": ["draw", "status"]}
+                if isinstance(data.get("topics"), list):
+                    generator.connections.subscribe(websocket, data["topics"])
+                if data.get("type") == "subscribe_status":
+                    await websocket.send_json(initial_state)
             elif data.get("type") == "canvas_data":
                 # Handle canvas data for gallery save
                 logger.info("Received canvas data, saving to gallery...")
-                success = await generator.save_to_gallery(data.get("data", ""))
+                if cluster.is_follower:
+                    try:
+                        result = await cluster.request("canvas_data", {"data": data.get("data", "")})
+                        success = result["success"]
+                    except Exception as e:
+                        logger.error(f"Error forwarding canvas data to the generator worker: {e}")
+                        success = False
+                else:
+                    success = await generator.save_to_gallery(data.get("data", ""))
                 if success:
                     logger.info("Successfully saved to gallery")
                 else:
@@ -855,19 +1202,66 @@ async def websocket_endpoint(websocket: WebSocket):
     except WebSocketDisconnect:
         logger.info("WebSocket disconnected")
     finally:
-        generator.viewers.remove(websocket)
-        await generator.broadcast_state({
-            "type": "display_update",
-            "viewers": len(generator.viewers)
-        })
+        generator.remove_viewer(websocket)
+        await generator.viewers_changed()
+
+@app.websocket("/ws/replay/{artwork_id}")
+async def replay_endpoint(websocket: WebSocket, artwork_id: str):
+    """Replay a stored artwork using the live drawing protocol"""
+    await websocket.accept()
+    
+    try:
+        item = gallery_store.get(artwork_id)
+        stream = replay_cache.get(artwork_id, item) if item else None
+        if not stream:
+            await websocket.send_json({
+                "type": "replay_error",
+                "drawing_id": artwork_id,
+                "message": "No replay available for this artwork"
+            })
+            await websocket.close(code=4404)
+            return
+        
+        logger.info(f"Replaying artwork {artwork_id} ({len(stream.frames)} frames)")
+        await websocket.send_text(stream.header)
+        for frame, delay in zip(stream.frames, stream.delays):
+            await websocket.send_text(frame)
+            if delay:
+                await asyncio.sleep(delay)
+        await websocket.send_text(stream.footer)
+        await websocket.close()
+        
+    except WebSocketDisconnect:
+        logger.info(f"Replay viewer for {artwork_id} disconnected")
+    except Exception as e:
+        logger.error(f"Error replaying artwork {artwork_id}: {e}")
+
+def serve_page(request: Request, name: str, variants: LazyVariants) -> Response:
+    """Serve a precompressed HTML shell, revalidated by ETag"""
+    encoding = choose_encoding(request.headers.get("accept-encoding"), variants)
+    etag = make_etag("page", name, variants.digest, encoding)
+    headers = {**cache_headers(etag), "Vary": "Accept-Encoding"}
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return encoded_response(request, variants, "text/html; charset=utf-8", headers, encoding)
 
 @app.get("/")
-async def home():
-    return HTMLResponse(HTML_TEMPLATE)
+async def home(request: Request):
+    return serve_page(request, "home", HOME_PAGE)
 
 @app.get("/gallery")
-async def gallery():
-    return HTMLResponse(GALLERY_TEMPLATE)
+async def gallery(request: Request):
+    return serve_page(request, "gallery", GALLERY_PAGE)
+
+@app.get("/assets/{filename}")
+async def get_asset(filename: str, request: Request):
+    """Serve a fingerprinted asset; its name changes with its content, so it never needs revalidating"""
+    asset = assets.get(filename)
+    if not asset:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    
+    media_type, variants = asset
+    return encoded_response(request, variants, media_type, {"Cache-Control": IMMUTABLE})
 
 @app.get("/api/current-art")
 async def get_current_art():
@@ -895,6 +1289,16 @@ async def get_current_art():
             "message": "Error fetching current art state"
         }
 
+@app.get("/api/events")
+async def events(topics: str = "gallery,votes"):
+    """Server-Sent Events stream of gallery and vote updates, for pages that don't need the drawing"""
+    subscriber = event_hub.subscribe(topic.strip() for topic in topics.split(","))
+    return StreamingResponse(
+        event_hub.stream(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/status")
 async def get_status():
     """Get generator status"""
@@ -902,41 +1306,80 @@ async def get_status():
         "status": generator.current_status,
         "phase": generator.current_phase,
         "timestamp": datetime.now().isoformat(),
-        "viewers": len(generator.viewers),
-        "is_running": generator.is_running
+        "viewers": generator.viewer_count(),
+        "is_running": generator.is_running,
+        "event_loop": loop_monitor.summary(),
+        "migration": migration.status()
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """Counters, gauges and latency histograms in the Prometheus text format"""
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+def gallery_version():
+    """Changes whenever the gallery contents or any live vote total change"""
+    return (gallery_store.version, vote_counter.version)
+
+def gallery_modified_at() -> float:
+    return max(gallery_store.modified_at, vote_counter.modified_at)
+
+def item_etag(kind: str, item_id: str) -> str:
+    """Validator for a single item: its content hash plus its live vote total"""
+    return make_etag(kind, gallery_store.digest(item_id), vote_counter.get(item_id))
+
+def _gallery_digest() -> str:
+    """Hash of every item as served, with its live vote total (blocking)"""
+    items = list(gallery_store.items)
+    return content_digest(
+        gallery_store.encode_item(item, vote_counter.get(item["id"], item.get("votes", 0))) for item in items)
+
+async def gallery_digest() -> str:
+    """Validator for whole-gallery responses, hashed once per gallery version
+
+    Derived from the content, so every worker (and the next restart) issues
+    the same ETag for the same gallery.
+    """
+    return await render_cache.get(("digest",), gallery_version(), _gallery_digest)
+
+def _render_gallery(sort: str, version: int) -> bytes:
+    """Serialize the gallery listing with live vote totals (blocking)
+
+    version is the change log version read before rendering, so changes made
+    while rendering are at worst delivered again by /api/gallery/changes.
+    """
+    items = list(gallery_store.items)
+    logger.info(f"Loaded {len(items)} items from gallery")
+    votes = {item["id"]: vote_counter.get(item["id"], item.get("votes", 0)) for item in items}
+    
+    # Sort items
+    if sort == "votes":
+        items.sort(key=lambda x: votes[x["id"]], reverse=True)
+    else:  # sort by new
+        items.sort(key=lambda x: x["timestamp"], reverse=True)
+    
+    # Unchanged items reuse their cached encoding
+    body = b",".join(gallery_store.encode_item(item, votes[item["id"]]) for item in items)
+    header = json.dumps({"success": True, "version": version, "epoch": change_log.epoch})
+    return header[:-1].encode() + b', "items": [' + body + b']}'
+
 @app.get("/api/gallery")
-async def get_gallery(sort: str = "new", limit: int = 50, offset: int = 0):
+async def get_gallery(request: Request, sort: str = "new", limit: int = 50, offset: int = 0):
     try:
-        gallery_file = "data/gallery_data.json"
-        logger.info(f"Loading gallery from {gallery_file}")
+        sort = "votes" if sort == "votes" else "new"
+        etag = make_etag("gallery", sort, await gallery_digest())
+        last_modified = gallery_modified_at()
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
         
-        if not os.path.exists(gallery_file):
-            logger.warning(f"Gallery file not found at {os.path.abspath(gallery_file)}")
-            with open(gallery_file, "w") as f:
-                json.dump([], f)
-            return {"success": True, "items": []}
-            
-        with open(gallery_file, "r") as f:
-            items = json.load(f)
-            logger.info(f"Loaded {len(items)} items from gallery")
-            
-            # Log sample items for debugging
-            if items:
-                logger.info(f"First item: {items[0]}")
-                logger.info(f"Last item: {items[-1]}")
-            
-            # Sort items
-            if sort == "votes":
-                items.sort(key=lambda x: x.get("votes", 0), reverse=True)
-            else:  # sort by new
-                items.sort(key=lambda x: x["timestamp"], reverse=True)
-            
-            return {
-                "success": True,
-                "items": items
-            }
+        # Rendered once per gallery version, off the event loop
+        version = change_log.version
+        content = await render_cache.get(("gallery", sort), gallery_version(), lambda: _render_gallery(sort, version))
+        return Response(
+            content=content,
+            media_type="application/json",
+            headers=cache_headers(etag, last_modified)
+        )
         
     except Exception as e:
         logger.error(f"Error loading gallery: {e}")
@@ -955,67 +1398,79 @@ async def get_gallery_image(filename: str):
         logger.error(f"Error serving image {filename}: {e}")
         return Response(status_code=500)
 
-@app.post("/api/gallery/{image_id}/upvote")
-async def upvote_image(image_id: str):
-    """Upvote a gallery image with proper error handling and data validation"""
+@app.get("/api/gallery/changes")
+async def get_gallery_changes(since: int = 0, epoch: str = "", limit: int = 500):
+    """Items inserted or edited and vote totals changed after a gallery version"""
     try:
-        gallery_file = "data/gallery_data.json"
-        if not os.path.exists(gallery_file):
-            raise HTTPException(status_code=404, detail="Gallery not found")
+        changes = change_log.since(since, epoch or None)
+        if changes is None or sum(len(ids) for ids in changes) > limit:
+            # Too far behind (or from a previous run): the client reloads the full list
+            return {
+                "success": True,
+                "reset": True,
+                "version": change_log.version,
+                "epoch": change_log.epoch
+            }
         
-        # Create backup before modification
-        backup_file = f"{gallery_file}.backup"
-        try:
-            with open(gallery_file, "r") as f:
-                items = json.load(f)
-                with open(backup_file, "w") as bf:
-                    json.dump(items, bf, indent=2)
-        except Exception as backup_error:
-            logger.error(f"Error creating backup: {backup_error}")
-            raise HTTPException(status_code=500, detail="Error processing vote")
+        changed_items, changed_votes = changes
+        items = []
+        for item_id in changed_items:
+            item = gallery_store.get(item_id)
+            if item:
+                items.append(dict(item, votes=vote_counter.get(item_id, item.get("votes", 0))))
+        items.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
         
-        # Find and update the image
-        image_found = False
-        for item in items:
-            if str(item.get("id", "")) == str(image_id):
-                image_found = True
-                try:
-                    # Ensure votes is an integer and increment
-                    current_votes = int(item.get("votes", 0))
-                    item["votes"] = current_votes + 1
-                    
-                    # Save updated data
-                    with open(gallery_file, "w") as f:
-                        json.dump(items, f, indent=2)
-                    
-                    # Remove backup after successful save
-                    if os.path.exists(backup_file):
-                        os.remove(backup_file)
-                    
-                    # Broadcast update to all connected clients
-                    await generator.broadcast_state({
-                        "type": "vote_update",
-                        "image_id": image_id,
-                        "votes": item["votes"]
-                    })
-                    
-                    return {
-                        "success": True,
-                        "votes": item["votes"],
-                        "image_id": image_id
-                    }
-                except Exception as save_error:
-                    logger.error(f"Error saving votes: {save_error}")
-                    # Restore from backup
-                    if os.path.exists(backup_file):
-                        os.replace(backup_file, gallery_file)
-                    raise HTTPException(status_code=500, detail="Error saving vote")
+        return {
+            "success": True,
+            "reset": False,
+            "version": change_log.version,
+            "epoch": change_log.epoch,
+            "items": items,
+            "votes": {item_id: vote_counter.get(item_id) for item_id in changed_votes - changed_items}
+        }
+        
+    except Exception as e:
+        logger.error(f"Error loading gallery changes: {e}")
+        raise HTTPException(status_code=500, detail="Error loading gallery changes")
+
+@app.post("/api/gallery/{image_id}/upvote")
+async def upvote_image(image_id: str, request: Request):
+    """Upvote a gallery image; the vote is journaled now and persisted in the next batch"""
+    try:
+        # Reject repeats and floods before they reach storage or the broadcast path
+        address = client_address(
+            request.client.host if request.client else None,
+            request.headers.get("x-forwarded-for"),
+            trusted_proxies
+        )
+        fingerprint = VoteGuard.fingerprint(address, request.headers.get("user-agent"))
+        if cluster.is_follower:
+            result = await cluster.request("vote", {"image_id": image_id, "fingerprint": fingerprint.hex()})
+        else:
+            result = cast_vote(image_id, fingerprint)
         
-        if not image_found:
+        if result["status"] == 409:
+            raise HTTPException(status_code=409, detail="Already voted for this image")
+        if result["status"] == 429:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many votes, please slow down",
+                headers={"Retry-After": str(math.ceil(result["retry_after"]))}
+            )
+        if result["status"] == 404:
             raise HTTPException(status_code=404, detail="Image not found")
+        
+        return {
+            "success": True,
+            "votes": result["votes"],
+            "image_id": image_id
+        }
             
     except HTTPException:
         raise
+    except ConnectionError as e:
+        logger.error(f"Error forwarding upvote: {e}")
+        raise HTTPException(status_code=503, detail="Voting is temporarily unavailable")
     except Exception as e:
         logger.error(f"Error upvoting image: {e}")
         raise HTTPException(status_code=500, detail="Error processing upvote")
@@ -1024,20 +1479,13 @@ async def upvote_image(image_id: str):
 async def get_reflection(image_id: str):
     """Get reflection for a specific image"""
     try:
-        gallery_file = "data/gallery_data.json"
-        if not os.path.exists(gallery_file):
-            raise HTTPException(status_code=404, detail="Gallery not found")
-            
-        with open(gallery_file, "r") as f:
-            items = json.load(f)
-        
-        for item in items:
-            if item["id"] == image_id:
-                return {
-                    "success": True,
-                    "reflection": item.get("reflection", "No reflection available"),
-                    "description": item.get("description", "")
-                }
+        item = gallery_store.get(image_id)
+        if item:
+            return {
+                "success": True,
+                "reflection": item.get("reflection", "No reflection available"),
+                "description": item.get("description", "")
+            }
         
         raise HTTPException(status_code=404, detail="Image not found")
             
@@ -1045,91 +1493,125 @@ async def get_reflection(image_id: str):
         logger.error(f"Error getting reflection: {e}")
         raise HTTPException(status_code=500, detail="Error retrieving reflection")
 
+@app.get("/api/gallery/{image_id}/votes")
+async def get_votes(image_id: str, request: Request):
+    """Live vote total for one image, used to hydrate cached artwork pages"""
+    if image_id not in gallery_store:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    votes = vote_counter.get(image_id)
+    etag = make_etag("votes", image_id, votes)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    
+    return JSONResponse(
+        {"success": True, "image_id": image_id, "votes": votes},
+        headers=cache_headers(etag)
+    )
+
 @app.get("/api/gallery/{image_id}")
-async def get_gallery_item(image_id: str):
+async def get_gallery_item(image_id: str, request: Request):
     """Get a single gallery item by ID"""
     try:
-        gallery_file = "data/gallery_data.json"
-        if not os.path.exists(gallery_file):
-            raise HTTPException(status_code=404, detail="Gallery not found")
+        item = gallery_store.get(image_id)
+        if item:
+            etag = item_etag("item", image_id)
+            if is_not_modified(request, etag):
+                return not_modified_response(etag)
             
-        with open(gallery_file, "r") as f:
-            items = json.load(f)
-        
-        for item in items:
-            if item["id"] == image_id:
-                filepath = os.path.join("static/gallery", item["filename"])
-                if os.path.exists(filepath):
-                    return item
+            filepath = os.path.join("static/gallery", item["filename"])
+            if os.path.exists(filepath):
+                return JSONResponse(item, headers=cache_headers(etag))
                     
         raise HTTPException(status_code=404, detail="Image not found")
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting gallery item: {e}")
         raise HTTPException(status_code=500, detail="Error retrieving gallery item")
 
 @app.get("/api/debug/versions")
 async def get_versions():
+    try:
+        anthropic_version = metadata.version("anthropic")  # without importing the SDK
+    except metadata.PackageNotFoundError:
+        anthropic_version = None
     return {
-        "anthropic_version": anthropic.__version__,
-        "api_key_prefix": ANTHROPIC_API_KEY[:10] + "...",
-        "model": "claude-3-sonnet-20240229"  # Current model we're using
+        "anthropic_version": anthropic_version,
+        "api_key_prefix": ANTHROPIC_API_KEY[:10] + "..." if ANTHROPIC_API_KEY else None,
+        "model_provider": generator.model.name,
+        "model": generator.model.model  # Current model we're using
     }
 
+def _render_artwork_page(item: Dict[str, Any], base_url: str) -> Dict[str, bytes]:
+    """Format an artwork page and precompress it (blocking)"""
+    artwork_id = str(item["id"])
+    try:
+        # Validate required fields
+        artwork_url = item.get("url")
+        if not artwork_url:
+            logger.error("Missing URL for artwork")
+            raise HTTPException(status_code=500, detail="Invalid artwork data")
+
+        # Safely get timestamp
+        timestamp = item.get("timestamp")
+        if timestamp:
+            try:
+                formatted_timestamp = datetime.fromisoformat(timestamp).strftime("%B %d, %Y, %I:%M %p")
+            except ValueError as e:
+                logger.error(f"Invalid timestamp format: {e}")
+                formatted_timestamp = "Date unknown"
+        else:
+            formatted_timestamp = "Date unknown"
+
+        # Social cards get the animated preview when instructions are stored
+        if item.get("instructions"):
+            preview_url = f"{base_url}/artwork/{artwork_id}/preview.gif"
+        else:
+            preview_url = artwork_url
+
+        # Votes are left out of the page and hydrated client-side, so votes never invalidate it
+        artwork_html = ARTWORK_SHELL.format(
+            artwork_url=artwork_url,
+            artwork_description=item.get("description", "No description available"),
+            artwork_reflection=item.get("reflection", "No reflection available"),
+            artwork_id=artwork_id,
+            artwork_timestamp=formatted_timestamp,
+            preview_url=preview_url
+        )
+        logger.info(f"Rendered artwork page {artwork_id}")
+        return compress_variants(artwork_html.encode())
+        
+    except HTTPException:
+        raise
+    except Exception as format_error:
+        logger.error(f"Error formatting artwork data: {format_error}")
+        logger.error(f"Item data: {item}")
+        raise HTTPException(status_code=500, detail=f"Error formatting artwork: {str(format_error)}")
+
 @app.get("/artwork/{artwork_id}")
-async def get_artwork_page(artwork_id: str):
+async def get_artwork_page(artwork_id: str, request: Request):
     """Serve individual artwork page"""
     try:
-        gallery_file = "data/gallery_data.json"
-        if not os.path.exists(gallery_file):
-            logger.error(f"Gallery file not found: {gallery_file}")
-            raise HTTPException(status_code=404, detail="Gallery not found")
+        item = gallery_store.get(artwork_id)
+        if item:
+            revision = gallery_store.revision(artwork_id)
+            encoding = choose_encoding(request.headers.get("accept-encoding"), SUPPORTED_ENCODINGS)
+            etag = make_etag("artwork", gallery_store.digest(artwork_id), ARTWORK_SHELL_DIGEST, encoding)
+            headers = {**cache_headers(etag), "Vary": "Accept-Encoding"}
+            if is_not_modified(request, etag):
+                return Response(status_code=304, headers=headers)
             
-        with open(gallery_file, "r") as f:
-            items = json.load(f)
+            # Rendered and compressed once per artwork revision, then served from memory
+            base_url = str(request.base_url).rstrip('/')
+            variants = await render_cache.get(
+                ("artwork", artwork_id, base_url),
+                revision,
+                lambda: _render_artwork_page(item, base_url)
+            )
+            return encoded_response(request, variants, "text/html; charset=utf-8", headers, encoding)
             
-        # Log for debugging
-        logger.info(f"Looking for artwork ID: {artwork_id}")
-        logger.info(f"Found {len(items)} items in gallery")
-        
-        for item in items:
-            if str(item["id"]) == str(artwork_id):
-                logger.info(f"Found artwork: {item}")
-                try:
-                    # Validate required fields
-                    artwork_url = item.get("url")
-                    if not artwork_url:
-                        logger.error("Missing URL for artwork")
-                        raise HTTPException(status_code=500, detail="Invalid artwork data")
-
-                    # Safely get timestamp
-                    timestamp = item.get("timestamp")
-                    if timestamp:
-                        try:
-                            formatted_timestamp = datetime.fromisoformat(timestamp).strftime("%B %d, %Y, %I:%M %p")
-                        except ValueError as e:
-                            logger.error(f"Invalid timestamp format: {e}")
-                            formatted_timestamp = "Date unknown"
-                    else:
-                        formatted_timestamp = "Date unknown"
-
-                    # Create a formatted HTML string with the artwork data
-                    artwork_html = ARTWORK_TEMPLATE.format(
-                        artwork_url=artwork_url,
-                        artwork_description=item.get("description", "No description available"),
-                        artwork_reflection=item.get("reflection", "No reflection available"),
-                        artwork_id=str(artwork_id),
-                        artwork_timestamp=formatted_timestamp,
-                        artwork_votes=str(item.get("votes", 0))
-                    )
-                    
-                    return HTMLResponse(artwork_html)
-                    
-                except Exception as format_error:
-                    logger.error(f"Error formatting artwork data: {format_error}")
-                    logger.error(f"Item data: {item}")
-                    raise HTTPException(status_code=500, detail=f"Error formatting artwork: {str(format_error)}")
-                
         # If we get here, artwork wasn't found
         logger.error(f"Artwork not found: {artwork_id}")
         raise HTTPException(status_code=404, detail="Artwork not found")
@@ -1141,26 +1623,91 @@ async def get_artwork_page(artwork_id: str):
         logger.error(f"Full error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error loading artwork: {str(e)}")
 
-# Add this utility function to main.py
-@app.get("/api/export-gallery")
-async def export_gallery():
-    """Export gallery data for backup/migration"""
+@app.get("/artwork/{artwork_id}/preview.{fmt}")
+async def get_artwork_preview(artwork_id: str, fmt: str):
+    """Serve an animated GIF/APNG of the artwork being drawn"""
+    if fmt not in PREVIEW_FORMATS:
+        raise HTTPException(status_code=404, detail="Unsupported preview format")
+    
     try:
-        gallery_file = "data/gallery_data.json"
-        if not os.path.exists(gallery_file):
-            raise HTTPException(status_code=404, detail="Gallery not found")
-            
-        with open(gallery_file, "r") as f:
-            items = json.load(f)
-            
-        # Return as downloadable JSON file
+        item = gallery_store.get(artwork_id)
+        if not item:
+            raise HTTPException(status_code=404, detail="Artwork not found")
+        
+        data = await preview_renderer.get(artwork_id, item, fmt)
+        if data is None:
+            raise HTTPException(status_code=404, detail="No preview available for this artwork")
+        
         return Response(
-            content=json.dumps(items, indent=2),
-            media_type="application/json",
-            headers={
-                "Content-Disposition": "attachment; filename=gallery_backup.json"
-            }
+            content=data,
+            media_type=PREVIEW_FORMATS[fmt][1],
+            headers={"Cache-Control": "public, max-age=86400"}
         )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error rendering preview for {artwork_id}: {e}")
+        raise HTTPException(status_code=500, detail="Error rendering preview")
+
+# Export formats: media type, download extension, and the bytes that open the body,
+# go between items, end each item and close the body
+EXPORT_FORMATS = {
+    "json": ("application/json", "json", b"[\n", b",\n", b"", b"\n]\n"),
+    "ndjson": ("application/x-ndjson", "ndjson", b"", b"", b"\n", b"")
+}
+
+async def stream_export(fmt: str) -> AsyncIterator[bytes]:
+    """Encode the archive item by item, in chunks of about EXPORT_CHUNK_SIZE bytes
+
+    Only the list of item references is copied (so inserts during the download
+    don't shift it); encodings are not cached, so memory stays flat however
+    large the archive is.
+    """
+    _, _, opening, separator, terminator, closing = EXPORT_FORMATS[fmt]
+    items = list(gallery_store.items)
+    chunk = [opening]
+    size = len(opening)
+    for index, item in enumerate(items):
+        data = gallery_store.encode_item(
+            item, vote_counter.get(item["id"], item.get("votes", 0)), remember=False)
+        if index:
+            chunk.append(separator)
+        chunk.append(data)
+        chunk.append(terminator)
+        size += len(separator) + len(data) + len(terminator)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield b"".join(chunk)
+            chunk, size = [], 0
+            await asyncio.sleep(0)  # let other requests run between chunks
+    chunk.append(closing)
+    yield b"".join(chunk)
+
+@app.get("/api/export-gallery")
+async def export_gallery(request: Request, fmt: str = Query("json", alias="format")):
+    """Stream the gallery for backup/migration as a compact JSON array or NDJSON (one item per line)
+
+    Compressed with gzip on the fly when the client accepts it.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    try:
+        encoding = choose_encoding(request.headers.get("accept-encoding"), ("gzip", "identity"))
+        etag = make_etag("export", fmt, encoding, await gallery_digest())
+        last_modified = gallery_modified_at()
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        media_type, extension, *_ = EXPORT_FORMATS[fmt]
+        headers = {
+            **cache_headers(etag, last_modified),
+            "Content-Disposition": f"attachment; filename=gallery_backup.{extension}",
+            "Vary": "Accept-Encoding"
+        }
+        body = stream_export(fmt)
+        if encoding == "gzip":
+            body = gzip_stream(body)
+            headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(body, media_type=media_type, headers=headers)
     except Exception as e:
         logger.error(f"Error exporting gallery: {e}")
         raise HTTPException(status_code=500, detail="Error exporting gallery")
@@ -1169,32 +1716,16 @@ async def export_gallery():
 async def import_gallery(gallery_data: List[dict]):
     """Import gallery data from backup"""
     try:
-        gallery_file = "data/gallery_data.json"
-        
-        # Backup existing data first
-        if os.path.exists(gallery_file):
-            backup_file = f"{gallery_file}.backup"
-            with open(gallery_file, "r") as f:
-                existing_data = json.load(f)
-            with open(backup_file, "w") as f:
-                json.dump(existing_data, f, indent=2)
-        
         # Merge new data with existing data, avoiding duplicates
-        existing_ids = {item["id"] for item in existing_data}
-        new_items = [item for item in gallery_data if item["id"] not in existing_ids]
-        
-        # Combine and sort by timestamp
-        combined_data = existing_data + new_items
-        combined_data.sort(key=lambda x: x["timestamp"], reverse=True)
-        
-        # Save merged data
-        with open(gallery_file, "w") as f:
-            json.dump(combined_data, f, indent=2)
+        if cluster.is_follower:
+            imported = (await cluster.request("import", {"items": gallery_data}))["imported"]
+        else:
+            imported = len(await import_items(gallery_data))
             
         return {
             "success": True,
-            "message": f"Imported {len(new_items)} new items",
-            "total_items": len(combined_data)
+            "message": f"Imported {imported} new items",
+            "total_items": len(gallery_store)
         }
         
     except Exception as e:
@@ -1207,4 +1738,8 @@ if __name__ == "__main__":
     print(f"{AI_TAGLINE}")
     print("Open http://localhost:8000 in your browser")
     print("================================\n")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    if CLUSTER_MODE:
+        # Workers import the app themselves; one of them is elected to run the generator
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,150 @@
+"""Profile cold start: how long importing main and starting the app take.
+
+Runs the app in fresh interpreters, against a temporary gallery of --items
+synthetic artworks, and reports:
+
+- import time of main (best and median of --runs)
+- time until the lifespan has started and the app would accept connections
+- the heaviest imports, from python -X importtime
+
+and exits non-zero when the best import exceeds --target-ms, so it can
+guard startup time in CI.
+
+    python scripts/startup_profile.py --items 10000 --target-ms 600
+    python scripts/startup_profile.py --json
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports main and starts its lifespan without generating, then prints timings
+PROBE = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def idle():
+    await asyncio.sleep(3600)
+main.generator.start = idle
+
+async def boot():
+    async with main.lifespan(main.app):
+        ready = time.perf_counter()
+    return ready
+
+ready = asyncio.run(boot())
+print(json.dumps({"import_ms": (imported - start) * 1000, "ready_ms": (ready - start) * 1000,
+                  "modules": len(sys.modules)}))
+"""
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def make_workdir(items: int) -> str:
+    workdir = tempfile.mkdtemp(prefix="iris-startup-")
+    os.makedirs(os.path.join(workdir, "data"))
+    gallery = [{
+        "id": f"startup_{i:07d}",
+        "url": f"https://example.invalid/drawing_{i}.png",
+        "description": "Concentric circles and golden rays",
+        "reflection": "A study in symmetry.",
+        "timestamp": f"2024-01-01T00:00:00.{i:06d}",
+        "votes": i % 50,
+        "pixel_count": 1000 + i % 9000
+    } for i in range(items)]
+    with open(os.path.join(workdir, "data", "gallery_data.json"), "w") as f:
+        json.dump(gallery, f)
+    return workdir
+
+
+def probe_env() -> dict:
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, IRIS_TRACE_FILE="")
+    env.setdefault("ANTHROPIC_API_KEY", "startup-profile-placeholder")
+    return env
+
+
+def run_probe(workdir: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", PROBE]
+    result = subprocess.run(command, cwd=workdir, env=probe_env(), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup probe failed:\n{result.stderr}")
+    return result
+
+
+def heaviest_imports(stderr: str, top: int) -> list:
+    """Modules imported directly by main, by cumulative time"""
+    imports = []
+    children = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        level = len(match.group(3)) // 2  # a nested import is indented two spaces per level
+        if level == 0:
+            # Imports are listed as they finish, so main's children come just before it
+            if match.group(4) == "main":
+                imports = children
+            children = []
+        elif level == 1:
+            children.append({"module": match.group(4), "self_ms": int(match.group(1)) / 1000,
+                             "cumulative_ms": int(match.group(2)) / 1000})
+    imports.sort(key=lambda entry: -entry["cumulative_ms"])
+    return imports[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000, help="artworks in the synthetic gallery")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="imports to list")
+    parser.add_argument("--target-ms", type=float, default=800, help="fail if the best import is slower")
+    parser.add_argument("--json", action="store_true", help="print a machine-readable report")
+    args = parser.parse_args()
+
+    workdir = make_workdir(args.items)
+    try:
+        run_probe(workdir)  # write bytecode caches so runs compare like for like
+        timings = [json.loads(run_probe(workdir).stdout.strip().splitlines()[-1]) for _ in range(args.runs)]
+        imports = heaviest_imports(run_probe(workdir, importtime=True).stderr, args.top)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    import_ms = [timing["import_ms"] for timing in timings]
+    ready_ms = [timing["ready_ms"] for timing in timings]
+    report = {
+        "items": args.items,
+        "runs": args.runs,
+        "import_ms": {"best": round(min(import_ms), 1), "median": round(statistics.median(import_ms), 1)},
+        "ready_ms": {"best": round(min(ready_ms), 1), "median": round(statistics.median(ready_ms), 1)},
+        "modules": timings[-1]["modules"],
+        "target_ms": args.target_ms,
+        "passed": min(import_ms) <= args.target_ms,
+        "heaviest_imports": imports
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"import main: best {report['import_ms']['best']:.0f} ms, median {report['import_ms']['median']:.0f} ms "
+              f"({report['modules']} modules)")
+        print(f"ready:       best {report['ready_ms']['best']:.0f} ms, median {report['ready_ms']['median']:.0f} ms "
+              f"({args.items} gallery items)")
+        print(f"\n{'module':<40}{'self ms':>10}{'cumulative ms':>16}")
+        for entry in imports:
+            print(f"{entry['module']:<40}{entry['self_ms']:>10.1f}{entry['cumulative_ms']:>16.1f}")
+        verdict = "under" if report["passed"] else "OVER"
+        print(f"\nBest import {report['import_ms']['best']:.0f} ms is {verdict} the {args.target_ms:.0f} ms target")
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
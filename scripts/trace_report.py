@@ -0,0 +1,111 @@
+"""Summarize creative-cycle traces written by the tracer.
+
+Reports count, p50, p95 and max duration per span name, then breaks down
+where cycle time goes: the share of each creative_cycle spent in its direct
+child phases, with the remainder (status updates, waits between phases)
+shown as "other".
+
+    python scripts/trace_report.py logs/traces.jsonl
+    python scripts/trace_report.py --json logs/traces.jsonl
+"""
+import argparse
+import json
+import math
+import sys
+from collections import defaultdict
+from typing import Dict, List
+
+ROOT_SPAN = "creative_cycle"
+
+
+def load_spans(paths: List[str]) -> List[dict]:
+    spans = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    print(f"{path}:{number}: skipping malformed line", file=sys.stderr)
+    return spans
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(values)))
+    return values[rank - 1]
+
+
+def phase_stats(spans: List[dict]) -> Dict[str, dict]:
+    durations: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    for span in spans:
+        durations[span["name"]].append(span["duration_ms"])
+        if span.get("error"):
+            errors[span["name"]] += 1
+    stats = {}
+    for name, values in durations.items():
+        values.sort()
+        stats[name] = {
+            "count": len(values),
+            "p50_ms": percentile(values, 50),
+            "p95_ms": percentile(values, 95),
+            "max_ms": values[-1],
+            "errors": errors[name]
+        }
+    return stats
+
+
+def cycle_breakdown(spans: List[dict]) -> dict:
+    cycles = {span["span_id"]: span for span in spans if span["name"] == ROOT_SPAN}
+    total = sum(cycle["duration_ms"] for cycle in cycles.values())
+    by_phase: Dict[str, float] = defaultdict(float)
+    for span in spans:
+        cycle = cycles.get(span.get("parent_id"))
+        if cycle is None:
+            continue
+        # Only the part of a phase inside its cycle counts; the gallery save can outlast it
+        cycle_end = cycle["start"] * 1000 + cycle["duration_ms"]
+        inside = min(span["duration_ms"], max(0.0, cycle_end - span["start"] * 1000))
+        by_phase[span["name"]] += inside
+    if total:
+        by_phase["other"] = max(0.0, total - sum(by_phase.values()))
+    return {
+        "cycles": len(cycles),
+        "total_ms": round(total, 3),
+        "mean_cycle_ms": round(total / len(cycles), 3) if cycles else 0.0,
+        "share": {name: round(ms / total, 4) if total else 0.0
+                  for name, ms in sorted(by_phase.items(), key=lambda item: -item[1])}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=["logs/traces.jsonl"])
+    parser.add_argument("--json", action="store_true", help="print a machine-readable report")
+    args = parser.parse_args()
+
+    spans = load_spans(args.paths)
+    report = {"spans": len(spans), "phases": phase_stats(spans), "cycle": cycle_breakdown(spans)}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'span':<26}{'count':>7}{'p50 ms':>12}{'p95 ms':>12}{'max ms':>12}{'errors':>8}")
+    for name, stats in sorted(report["phases"].items(), key=lambda item: -item[1]["p50_ms"]):
+        print(f"{name:<26}{stats['count']:>7}{stats['p50_ms']:>12.1f}{stats['p95_ms']:>12.1f}"
+              f"{stats['max_ms']:>12.1f}{stats['errors']:>8}")
+
+    cycle = report["cycle"]
+    print(f"\n{cycle['cycles']} cycles, mean {cycle['mean_cycle_ms'] / 1000:.1f}s; time spent in:")
+    for name, share in cycle["share"].items():
+        print(f"  {name:<24}{share * 100:>6.1f}%")
+
+
+if __name__ == "__main__":
+    main()
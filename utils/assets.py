@@ -0,0 +1,66 @@
+import hashlib
+import logging
+import re
+from typing import Dict, Optional, Tuple
+
+from utils.compression import LazyVariants
+
+logger = logging.getLogger('iris')
+
+# Inline blocks only; tags that already carry attributes (e.g. src=) are left alone
+INLINE_BLOCK = re.compile(r"<(style|script)>(.*?)</\1>", re.S)
+
+ASSET_TYPES = {
+    "style": ("css", "text/css; charset=utf-8"),
+    "script": ("js", "application/javascript; charset=utf-8")
+}
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class AssetBundle:
+    """Fingerprinted CSS/JS extracted from the page templates, compressed in memory on first use"""
+
+    def __init__(self, prefix: str = "/assets"):
+        self.prefix = prefix
+        self.assets: Dict[str, Tuple[str, LazyVariants]] = {}  # filename -> (media type, variants)
+
+    def _add(self, name: str, kind: str, source: str) -> str:
+        extension, media_type = ASSET_TYPES[kind]
+        body = source.strip().encode()
+        digest = hashlib.blake2b(body, digest_size=6).hexdigest()
+        filename = f"{name}.{digest}.{extension}"
+        if filename not in self.assets:
+            self.assets[filename] = (media_type, LazyVariants(body))
+        return f"{self.prefix}/{filename}"
+
+    def build(self, name: str, template: str, format_template: bool = False) -> str:
+        """Move a template's inline styles and scripts into assets and return the slimmed template
+
+        format_template marks templates rendered with str.format, whose literal
+        braces are doubled; the extracted files get single braces.
+        """
+        counters = {"style": 0, "script": 0}
+
+        def extract(match):
+            kind, source = match.group(1), match.group(2)
+            if format_template:
+                source = source.replace("{{", "{").replace("}}", "}")
+            suffix = f"-{counters[kind]}" if counters[kind] else ""
+            counters[kind] += 1
+            url = self._add(f"{name}{suffix}", kind, source)
+            if kind == "style":
+                return f'<link rel="stylesheet" href="{url}">'
+            return f'<script src="{url}"></script>'
+
+        shell = INLINE_BLOCK.sub(extract, template)
+        logger.info(f"Built assets for {name}: {len(template)} -> {len(shell)} bytes of HTML")
+        return shell
+
+    def get(self, filename: str) -> Optional[Tuple[str, LazyVariants]]:
+        return self.assets.get(filename)
+
+    def warm(self):
+        """Compress every asset in every encoding (blocking)"""
+        for _, variants in self.assets.values():
+            variants.warm()
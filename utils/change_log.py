@@ -0,0 +1,53 @@
+import os
+import time
+from collections import deque
+from typing import Deque, Optional, Set, Tuple
+
+# Versions are counted in memory, so they only mean something within the process that issued them
+BOOT_ID = f"{int(time.time() * 1000):x}{os.getpid():x}"
+
+
+class ChangeLog:
+    """Bounded log of gallery mutations with monotonic versions for delta sync
+
+    Entries only record which item changed and how; the current item and vote
+    total are looked up when changes are served, so replaying several entries
+    for one item collapses into a single update.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.epoch = BOOT_ID  # versions restart with the process
+        self.version = 0
+        self._resets = 0
+        self._entries: Deque[Tuple[int, str, str]] = deque(maxlen=max_entries)  # (version, kind, item id)
+
+    def reset(self):
+        """Start a new epoch, e.g. after reloading state wholesale, so clients reload too"""
+        self._resets += 1
+        self.epoch = f"{BOOT_ID}.{self._resets}"
+        self._entries.clear()
+
+    def record(self, kind: str, item_id: str) -> int:
+        """Log an "item" (inserted or edited) or "vote" change and return its version"""
+        self.version += 1
+        self._entries.append((self.version, kind, str(item_id)))
+        return self.version
+
+    def since(self, version: int, epoch: Optional[str] = None) -> Optional[Tuple[Set[str], Set[str]]]:
+        """Ids of changed items and of changed vote totals after version
+
+        Returns None when the client must reload instead: its version comes from
+        another process lifetime or predates the oldest retained entry.
+        """
+        if (epoch and epoch != self.epoch) or version < 0 or version > self.version:
+            return None
+        oldest = self._entries[0][0] if self._entries else self.version + 1
+        if version < oldest - 1:
+            return None
+
+        items, votes = set(), set()
+        for entry_version, kind, item_id in reversed(self._entries):
+            if entry_version <= version:
+                break
+            (items if kind == "item" else votes).add(item_id)
+        return items, votes
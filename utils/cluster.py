@@ -0,0 +1,282 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+from typing import Dict, Any, Awaitable, Callable, Optional
+
+from utils.frame_ring import FrameRing
+
+logger = logging.getLogger('iris')
+
+# Canvas snapshots travel over the bus, so lines can be large
+MAX_LINE = 32 * 1024 * 1024
+
+
+class Cluster:
+    """Leader election and a local message bus between uvicorn worker processes
+
+    Workers compete for an exclusive flock; the holder runs generation and owns
+    all persistent state. It serves a Unix socket on which every message it
+    broadcasts is published once per follower, except drawing frames, which are
+    written once into a shared-memory ring that every follower reads. Followers
+    fan those messages out to their own viewers and send mutations back as
+    requests. When the leader goes away its lock is released, and the first
+    follower to notice takes over.
+    """
+
+    def __init__(self,
+                 lock_file: str = "data/generator.lock",
+                 socket_path: str = "data/iris-bus.sock",
+                 max_buffer: int = 4 * 1024 * 1024,
+                 retry_interval: float = 1.0,
+                 request_timeout: float = 30.0,
+                 frame_poll: float = 0.002,
+                 idle_poll: float = 0.02):
+        self.lock_file = lock_file
+        self.socket_path = socket_path
+        self.max_buffer = max_buffer  # bytes queued to a follower before it is dropped
+        self.retry_interval = retry_interval
+        self.request_timeout = request_timeout
+        self.frame_poll = frame_poll  # ring polling interval while frames are flowing
+        self.idle_poll = idle_poll
+
+        self.enabled = False
+        self.is_leader = False
+        self.remote_viewers: Dict[asyncio.StreamWriter, int] = {}  # viewer count per follower
+
+        # Set by the application
+        self.on_lead: Optional[Callable[[], Awaitable[None]]] = None
+        self.on_message: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+        self.on_frame: Optional[Callable[[str], Awaitable[None]]] = None
+        self.on_viewers: Optional[Callable[[], Awaitable[None]]] = None
+        self.snapshot: Optional[Callable[[], Dict[str, Any]]] = None
+        self.handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {}
+
+        self._lock_fd: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._followers: Dict[asyncio.StreamWriter, None] = {}
+        self._upstream: Optional[asyncio.StreamWriter] = None
+        self._connected = asyncio.Event()
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_request = 0
+        self._follow_task: Optional[asyncio.Task] = None
+        self.frames: Optional[FrameRing] = None
+        self._frames_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_follower(self) -> bool:
+        return self.enabled and not self.is_leader
+
+    @property
+    def viewer_total(self) -> int:
+        return sum(self.remote_viewers.values())
+
+    def _try_lock(self) -> bool:
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    async def start(self):
+        """Become leader if the lock is free, otherwise follow the current leader"""
+        self.enabled = True
+        if self._try_lock():
+            await self._lead()
+        else:
+            logger.info(f"Worker {os.getpid()} following the generator leader")
+            self._follow_task = asyncio.create_task(self._follow())
+
+    async def _lead(self):
+        self.is_leader = True
+        logger.info(f"Worker {os.getpid()} elected generator leader")
+        await self.on_lead()
+        self._attach_frames(None)
+        self.frames = FrameRing(create=True)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)  # left behind by a previous leader
+        self._server = await asyncio.start_unix_server(self._serve_follower, self.socket_path, limit=MAX_LINE)
+
+    @staticmethod
+    def _encode(message: Dict[str, Any]) -> bytes:
+        return json.dumps(message).encode() + b"\n"
+
+    def publish_frame(self, frame: str) -> bool:
+        """Put an encoded drawing frame in the shared ring
+
+        Returns False, and the frame must go over the bus (possibly ahead of
+        frames still in the ring), only before the ring exists or for a frame
+        over the ring's max_frame_size, half the ring, which drawing frames
+        never come close to.
+        """
+        if not self._followers:
+            return True  # nobody to relay to
+        if self.frames is None:
+            return False
+        return self.frames.write(frame.encode()) is not None
+
+    def publish(self, message: Dict[str, Any]):
+        """Send a message to every follower; no-op unless this worker leads"""
+        if not self._followers:
+            return
+        line = self._encode(message)
+        for writer in list(self._followers):
+            if writer.transport.get_write_buffer_size() > self.max_buffer:
+                # A stalled follower reconnects and resyncs rather than holding frames in memory
+                logger.warning("Dropping follower that is not keeping up with the bus")
+                writer.close()
+                self._followers.pop(writer, None)
+                continue
+            writer.write(line)
+
+    async def _serve_follower(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # The snapshot and the ring position are taken together, so the follower neither misses nor repeats frames
+        sync = {"kind": "sync", "state": self.snapshot(), "frames": self.frames.name, "frame_seq": self.frames.seq}
+        writer.write(self._encode(sync))
+        self._followers[writer] = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if message.get("kind") == "viewers":
+                    self.remote_viewers[writer] = int(message.get("count", 0))
+                    await self.on_viewers()
+                elif message.get("kind") == "request":
+                    asyncio.create_task(self._answer(writer, message))
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            logger.error(f"Follower connection error: {e}")
+        finally:
+            self._followers.pop(writer, None)
+            if self.remote_viewers.pop(writer, None):
+                await self.on_viewers()
+            writer.close()
+
+    async def _answer(self, writer: asyncio.StreamWriter, message: Dict[str, Any]):
+        reply = {"kind": "reply", "id": message.get("id")}
+        try:
+            handler = self.handlers[message["name"]]
+            reply["result"] = await handler(message.get("payload") or {})
+        except Exception as e:
+            logger.error(f"Error handling {message.get('name')} for follower: {e}")
+            reply["error"] = str(e)
+        if not writer.is_closing():
+            writer.write(self._encode(reply))
+
+    async def _follow(self):
+        while self.enabled:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.socket_path, limit=MAX_LINE)
+            except (ConnectionError, FileNotFoundError):
+                reader = writer = None
+
+            if writer is not None:
+                self._upstream = writer
+                self._connected.set()
+                try:
+                    while True:
+                        line = await reader.readline()
+                        if not line:
+                            break
+                        message = json.loads(line)
+                        if message.get("kind") == "reply":
+                            future = self._pending.pop(message.get("id"), None)
+                            if future is not None and not future.done():
+                                future.set_result(message)
+                        elif message.get("kind") == "sync":
+                            await self.on_message(message)
+                            self._attach_frames(message["frames"], message["frame_seq"])
+                        else:
+                            await self.on_message(message)
+                except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+                    logger.error(f"Lost connection to generator leader: {e}")
+                finally:
+                    self._upstream = None
+                    self._connected.clear()
+                    writer.close()
+                    for future in self._pending.values():
+                        if not future.done():
+                            future.set_exception(ConnectionError("Generator leader went away"))
+                    self._pending.clear()
+
+            # The leader may be gone for good; whoever gets its lock takes over
+            if self.enabled and self._try_lock():
+                await self._lead()
+                return
+            await asyncio.sleep(self.retry_interval)
+
+    def _attach_frames(self, name: Optional[str], seq: int = 0):
+        """Follow a leader's frame ring from the given sequence (None detaches)"""
+        if self._frames_task is not None:
+            self._frames_task.cancel()
+            self._frames_task = None
+        if self.frames is not None:
+            self.frames.close()
+            self.frames = None
+        if name:
+            self.frames = FrameRing(name)
+            self.frames.seek(seq)
+            self._frames_task = asyncio.create_task(self._read_frames(self.frames))
+
+    async def _read_frames(self, ring: FrameRing):
+        loop = asyncio.get_running_loop()
+        last_frame = 0.0
+        while True:
+            try:
+                frames = ring.read()
+                for frame in frames:
+                    await self.on_frame(frame)
+            except Exception as e:
+                logger.error(f"Error relaying drawing frames: {e}")
+                frames = []
+            if frames:
+                last_frame = loop.time()
+            # Poll tightly while a drawing is streaming, lazily in between
+            busy = loop.time() - last_frame < 1.0
+            await asyncio.sleep(self.frame_poll if busy else self.idle_poll)
+
+    async def request(self, name: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Ask the leader to perform a mutation and wait for its result"""
+        if self._upstream is None:
+            # Ride out a leader restart or failover instead of failing straight away
+            try:
+                await asyncio.wait_for(self._connected.wait(), timeout=self.request_timeout)
+            except asyncio.TimeoutError:
+                raise ConnectionError("Not connected to the generator leader")
+        self._next_request += 1
+        request_id = self._next_request
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._upstream.write(self._encode({"kind": "request", "id": request_id, "name": name, "payload": payload}))
+        try:
+            reply = await asyncio.wait_for(future, timeout=self.request_timeout)
+        finally:
+            self._pending.pop(request_id, None)
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply["result"]
+
+    def report_viewers(self, count: int):
+        """Tell the leader how many viewers this follower serves"""
+        if self._upstream is not None:
+            self._upstream.write(self._encode({"kind": "viewers", "count": count}))
+
+    async def close(self):
+        self.enabled = False
+        if self._follow_task is not None:
+            self._follow_task.cancel()
+        self._attach_frames(None)
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._followers):
+                writer.close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)  # releases the flock for the next leader
+            self._lock_fd = None
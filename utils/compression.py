@@ -0,0 +1,116 @@
+import gzip
+import zlib
+from collections.abc import Mapping
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from utils.http_cache import content_digest
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Preferred order when the client accepts several encodings equally
+ENCODING_PREFERENCE = ("br", "gzip", "identity")
+SUPPORTED_ENCODINGS = tuple(e for e in ENCODING_PREFERENCE if e != "br" or brotli is not None)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Encode a body at the highest compression level, for content served many times"""
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=11)
+    if encoding == "identity":
+        return body
+    raise ValueError(f"Unsupported encoding {encoding!r}")
+
+
+def compress_variants(body: bytes) -> Dict[str, bytes]:
+    """Precompute every supported content encoding of a response body"""
+    return {encoding: compress(body, encoding) for encoding in SUPPORTED_ENCODINGS}
+
+
+class LazyVariants(Mapping):
+    """Every supported encoding of a body, each compressed the first time it is requested
+
+    Used for content built at import time, so startup doesn't pay for
+    compressing pages nobody has asked for yet; warm() fills in the rest
+    (from a worker thread) once the server is up.
+    """
+
+    def __init__(self, body: bytes):
+        self._variants = {"identity": body}
+        self.digest = content_digest([body])
+
+    def __getitem__(self, encoding: str) -> bytes:
+        variant = self._variants.get(encoding)
+        if variant is None:
+            if encoding not in SUPPORTED_ENCODINGS:
+                raise KeyError(encoding)
+            variant = self._variants[encoding] = compress(self._variants["identity"], encoding)
+        return variant
+
+    def __contains__(self, encoding) -> bool:
+        return encoding in SUPPORTED_ENCODINGS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(SUPPORTED_ENCODINGS)
+
+    def __len__(self) -> int:
+        return len(SUPPORTED_ENCODINGS)
+
+    def warm(self):
+        for encoding in SUPPORTED_ENCODINGS:
+            self[encoding]
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Gzip a stream of chunks on the fly, for bodies too large to compress up front"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def choose_encoding(accept_encoding: Optional[str], available) -> str:
+    """Pick the best available encoding allowed by an Accept-Encoding header"""
+    weights = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+
+    best, best_q = "identity", 0.0
+    for encoding in ENCODING_PREFERENCE:
+        if encoding not in available:
+            continue
+        q = weights.get(encoding, weights.get("*", 1.0 if encoding == "identity" else 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def encoded_response(request: Request, variants: Mapping, media_type: str,
+                     headers: Optional[Dict[str, str]] = None,
+                     encoding: Optional[str] = None) -> Response:
+    """Serve the precompressed variant that best matches the request"""
+    encoding = encoding or choose_encoding(request.headers.get("accept-encoding"), variants)
+    response_headers = dict(headers or {})
+    response_headers["Vary"] = "Accept-Encoding"
+    if encoding != "identity":
+        response_headers["Content-Encoding"] = encoding
+    return Response(content=variants[encoding], media_type=media_type, headers=response_headers)
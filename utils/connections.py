@@ -0,0 +1,182 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Set
+
+from starlette.websockets import WebSocket
+
+from utils.event_stream import TOPICS
+
+logger = logging.getLogger('iris')
+
+PING = json.dumps({"type": "ping"})
+
+
+class Outbox:
+    """Messages queued for one socket, and when its writer started the send in progress"""
+    __slots__ = ("queue", "waiter", "sending_since", "writer")
+
+    def __init__(self):
+        self.queue: Deque[str] = deque()
+        self.waiter: Optional[asyncio.Future] = None  # set while the writer waits for a message
+        self.sending_since: Optional[float] = None
+        self.writer: Optional[asyncio.Task] = None
+
+
+class ConnectionManager:
+    """Registry of live viewer sockets with per-topic membership, heartbeats and idle reaping
+
+    Every socket is pinged periodically and must show some sign of life (a
+    pong or any other message) within idle_timeout, otherwise it is dropped,
+    so broadcasts stop paying for half-open connections. Removal is idempotent
+    and O(1) per topic, and the registry refuses sockets beyond max_connections.
+
+    Broadcasts only queue a message per socket; each socket has its own writer
+    task, so a viewer that stops reading delays nobody else. post() reports a
+    socket whose send has been stuck for broadcast_timeout, or whose backlog
+    exceeds max_backlog messages, so the caller can drop it.
+    """
+
+    def __init__(self, max_connections: int = 5000, ping_interval: float = 15.0,
+                 idle_timeout: float = 45.0, send_timeout: float = 5.0,
+                 broadcast_timeout: float = 1.0, max_backlog: int = 1000):
+        self.max_connections = max_connections
+        self.ping_interval = ping_interval
+        self.idle_timeout = idle_timeout
+        self.send_timeout = send_timeout  # for pings and closes, which may hit a stalled peer
+        self.broadcast_timeout = broadcast_timeout
+        self.max_backlog = max_backlog
+        self.last_seen: Dict[WebSocket, float] = {}
+        self.outboxes: Dict[WebSocket, Outbox] = {}
+        self.subscriptions: Dict[str, Set[WebSocket]] = {topic: set() for topic in TOPICS}
+        self.reaped = 0
+        self.is_running = False
+
+    def __len__(self) -> int:
+        return len(self.last_seen)
+
+    def __contains__(self, websocket: WebSocket) -> bool:
+        return websocket in self.last_seen
+
+    @property
+    def full(self) -> bool:
+        return len(self.last_seen) >= self.max_connections
+
+    def add(self, websocket: WebSocket, topics: Iterable[str] = TOPICS) -> bool:
+        """Register a socket for the given topics; False when at capacity"""
+        if self.full:
+            return False
+        self.last_seen[websocket] = time.monotonic()
+        outbox = self.outboxes[websocket] = Outbox()
+        outbox.writer = asyncio.create_task(self._write(websocket, outbox))
+        self.subscribe(websocket, topics)
+        return True
+
+    def subscribe(self, websocket: WebSocket, topics: Iterable[str]):
+        """Replace a socket's topic subscriptions; unknown topics are ignored"""
+        if websocket not in self.last_seen:
+            return
+        topics = set(topics)
+        for topic, members in self.subscriptions.items():
+            if topic in topics:
+                members.add(websocket)
+            else:
+                members.discard(websocket)
+
+    def members(self, topic: str) -> List[WebSocket]:
+        """Snapshot of a topic's sockets, safe to iterate across awaits"""
+        return list(self.subscriptions.get(topic, ()))
+
+    def post(self, websocket: WebSocket, text: str, now: float) -> bool:
+        """Queue a message for a socket's writer; False if the socket is stalled and should be dropped"""
+        outbox = self.outboxes.get(websocket)
+        if outbox is None:
+            return True  # already gone
+        if outbox.sending_since is not None and now - outbox.sending_since > self.broadcast_timeout:
+            return False
+        if len(outbox.queue) >= self.max_backlog:
+            return False
+        outbox.queue.append(text)
+        if outbox.waiter is not None and not outbox.waiter.done():
+            outbox.waiter.set_result(None)
+        return True
+
+    async def _write(self, websocket: WebSocket, outbox: Outbox):
+        """Send a socket's queued messages in order until it is discarded"""
+        try:
+            while True:
+                if not outbox.queue:
+                    outbox.waiter = asyncio.get_running_loop().create_future()
+                    await outbox.waiter
+                    continue
+                outbox.sending_since = time.monotonic()
+                await websocket.send_text(outbox.queue.popleft())
+                outbox.sending_since = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error broadcasting to viewer: {e}")
+            self.discard(websocket)
+
+    def touch(self, websocket: WebSocket):
+        """Record activity from a socket"""
+        if websocket in self.last_seen:
+            self.last_seen[websocket] = time.monotonic()
+
+    def discard(self, websocket: WebSocket) -> bool:
+        """Forget a socket; safe to call any number of times"""
+        if self.last_seen.pop(websocket, None) is None:
+            return False
+        for members in self.subscriptions.values():
+            members.discard(websocket)
+        outbox = self.outboxes.pop(websocket)
+        if outbox.writer is not asyncio.current_task():
+            outbox.writer.cancel()
+        return True
+
+    async def drop(self, websocket: WebSocket, code: int = 1008):
+        """Forget a socket and close it, waiting at most send_timeout on a stalled peer"""
+        self.discard(websocket)
+        await self._close(websocket, code)
+
+    async def _close(self, websocket: WebSocket, code: int):
+        try:
+            await asyncio.wait_for(websocket.close(code=code), timeout=self.send_timeout)
+        except Exception:
+            pass  # already gone
+
+    async def sweep(self) -> int:
+        """Drop sockets idle past the timeout and ping the rest; returns how many were dropped"""
+        now = time.monotonic()
+        dropped = 0
+        for websocket, seen in list(self.last_seen.items()):
+            if now - seen > self.idle_timeout:
+                self.discard(websocket)
+                await self._close(websocket, 1001)
+                dropped += 1
+                continue
+            try:
+                await asyncio.wait_for(websocket.send_text(PING), timeout=self.send_timeout)
+            except Exception:
+                self.discard(websocket)
+                dropped += 1
+        if dropped:
+            self.reaped += dropped
+            logger.info(f"Reaped {dropped} dead or idle viewer connections")
+        return dropped
+
+    async def run(self, on_reaped=None):
+        """Heartbeat loop; on_reaped is awaited after a sweep that dropped sockets"""
+        self.is_running = True
+        while self.is_running:
+            await asyncio.sleep(self.ping_interval)
+            try:
+                if await self.sweep() and on_reaped is not None:
+                    await on_reaped()
+            except Exception as e:
+                logger.error(f"Error in connection heartbeat: {e}")
+
+    def stop(self):
+        self.is_running = False
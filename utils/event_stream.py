@@ -0,0 +1,86 @@
+import asyncio
+import json
+import logging
+from typing import Dict, Any, AsyncIterator, Iterable, Set
+
+logger = logging.getLogger('iris')
+
+# Topics a client can subscribe to; broadcast messages not listed below are drawing commands
+TOPICS = ("draw", "status", "gallery", "votes")
+
+MESSAGE_TOPICS = {
+    "display_update": "status",
+    "reflection_update": "status",
+    "request_canvas_data": "draw",  # only clients with a canvas can answer
+    "gallery_update": "gallery",
+    "vote_update": "votes"
+}
+
+# Topics carried over SSE; the drawing stream stays on /ws
+SSE_TOPICS = ("gallery", "votes")
+
+
+def message_topic(data: Dict[str, Any]) -> str:
+    """Topic a broadcast message belongs to"""
+    return MESSAGE_TOPICS.get(data.get("type"), "draw")
+
+
+class Subscriber:
+    """One SSE client: the topics it wants and a bounded queue of encoded events"""
+
+    def __init__(self, topics: Set[str], max_queue: int):
+        self.topics = topics
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue(maxsize=max_queue)
+        self.closed = False
+
+
+class EventHub:
+    """Topic-filtered fan-out of broadcast messages to Server-Sent Events clients
+
+    Each event is encoded once and queued for every subscriber of its topic. A
+    subscriber whose queue fills up is disconnected rather than slowing down
+    publishers; the browser's EventSource reconnects and resyncs on its own.
+    """
+
+    def __init__(self, max_queue: int = 100, heartbeat: float = 15.0, retry_ms: int = 3000):
+        self.max_queue = max_queue
+        self.heartbeat = heartbeat
+        self.retry_ms = retry_ms
+        self.subscribers: Set[Subscriber] = set()
+
+    def subscribe(self, topics: Iterable[str]) -> Subscriber:
+        subscriber = Subscriber(set(topics) & set(SSE_TOPICS), self.max_queue)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscriber.closed = True
+        self.subscribers.discard(subscriber)
+
+    def publish(self, data: Dict[str, Any]):
+        """Queue a broadcast message for subscribers of its topic (no-op for other types)"""
+        topic = message_topic(data)
+        if topic not in SSE_TOPICS:
+            return
+        event = f"event: {topic}\ndata: {json.dumps(data)}\n\n".encode()
+        for subscriber in list(self.subscribers):
+            if topic not in subscriber.topics:
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                logger.warning("Dropping slow event stream subscriber")
+                # Its stream wakes on the full queue, sees closed and ends
+                self.unsubscribe(subscriber)
+
+    async def stream(self, subscriber: Subscriber) -> AsyncIterator[bytes]:
+        """Yield encoded events for a subscriber, with comment heartbeats to keep proxies open"""
+        try:
+            yield f"retry: {self.retry_ms}\n\n".encode()
+            while not subscriber.closed:
+                try:
+                    yield await asyncio.wait_for(subscriber.queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+        finally:
+            self.unsubscribe(subscriber)
@@ -0,0 +1,139 @@
+import logging
+import struct
+from multiprocessing import resource_tracker, shared_memory
+from typing import List, Optional
+
+logger = logging.getLogger('iris')
+
+HEADER = struct.Struct("<QII")       # last published sequence, slot count, slot size
+SLOT_HEADER = struct.Struct("<QIHH")  # sequence held by the slot (0 while being written), payload length,
+                                      # index of this part and number of parts of the frame
+
+
+class FrameRing:
+    """Fixed-size single-writer ring of encoded frames in shared memory
+
+    The writer stores each frame once; any number of reader processes follow
+    it with their own cursor. Every slot carries the sequence number of the
+    frame in it, written last and re-checked after reading, so a reader that
+    is lapped by the writer detects the overwrite and skips ahead instead of
+    returning a torn frame. A frame larger than a slot spans consecutive
+    slots (one sequence number each) and becomes visible only once all of
+    them are written, so frames of any size keep their order.
+    """
+
+    def __init__(self, name: Optional[str] = None, slots: int = 4096, slot_size: int = 1024,
+                 create: bool = False):
+        if create:
+            size = HEADER.size + slots * (SLOT_HEADER.size + slot_size)
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            HEADER.pack_into(self.shm.buf, 0, 0, slots, slot_size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        # The segment's lifetime is managed explicitly (the creator unlinks it in close()), so keep
+        # the resource tracker, which worker processes may share, from unlinking it behind our back
+        resource_tracker.unregister(self.shm._name, "shared_memory")
+        _, self.slots, self.slot_size = HEADER.unpack_from(self.shm.buf, 0)
+        self.name = self.shm.name
+        self.owner = create
+        self.cursor = self.seq + 1  # next sequence this reader expects
+        self.lost = 0  # slots overwritten before this reader got to them
+
+    @property
+    def seq(self) -> int:
+        """Sequence number of the most recently published slot"""
+        return HEADER.unpack_from(self.shm.buf, 0)[0]
+
+    @property
+    def max_frame_size(self) -> int:
+        # A frame may take up to half the ring, so readers have room to catch up with it
+        return self.slots // 2 * self.slot_size
+
+    def _offset(self, seq: int) -> int:
+        return HEADER.size + (seq % self.slots) * (SLOT_HEADER.size + self.slot_size)
+
+    def write(self, frame: bytes) -> Optional[int]:
+        """Publish a frame and return its last sequence, or None if it is over max_frame_size"""
+        if len(frame) > self.max_frame_size:
+            return None
+        parts = max(1, -(-len(frame) // self.slot_size))
+        first = self.seq + 1
+        buf = self.shm.buf
+        for part in range(parts):
+            seq = first + part
+            offset = self._offset(seq)
+            chunk = frame[part * self.slot_size:(part + 1) * self.slot_size]
+            SLOT_HEADER.pack_into(buf, offset, 0, 0, 0, 0)
+            buf[offset + SLOT_HEADER.size:offset + SLOT_HEADER.size + len(chunk)] = chunk
+            SLOT_HEADER.pack_into(buf, offset, seq, len(chunk), part, parts)
+        seq = first + parts - 1
+        HEADER.pack_into(buf, 0, seq, self.slots, self.slot_size)
+        return seq
+
+    def seek(self, seq: int):
+        """Continue reading after the given sequence"""
+        self.cursor = seq + 1
+
+    def _read_part(self, seq: int) -> Optional[memoryview]:
+        """A slot's payload if it still holds seq (the caller re-checks after copying)"""
+        offset = self._offset(seq)
+        slot_seq, length, _, _ = SLOT_HEADER.unpack_from(self.shm.buf, offset)
+        if slot_seq != seq:
+            return None
+        start = offset + SLOT_HEADER.size
+        return self.shm.buf[start:start + length]
+
+    def _still_holds(self, seq: int) -> bool:
+        return SLOT_HEADER.unpack_from(self.shm.buf, self._offset(seq))[0] == seq
+
+    def read(self, limit: int = 256) -> List[str]:
+        """Frames published since the last read, decoded straight out of shared memory"""
+        head = self.seq
+        if head - self.cursor >= self.slots:
+            # Lapped: everything older than one ring's worth is gone
+            skipped = head - self.slots + 1 - self.cursor
+            self.lost += skipped
+            logger.warning(f"Frame ring reader fell behind, skipped {skipped} slots")
+            self.cursor = head - self.slots + 1
+
+        frames = []
+        buf = self.shm.buf
+        while self.cursor <= head and len(frames) < limit:
+            seq = self.cursor
+            slot_seq, _, part, parts = SLOT_HEADER.unpack_from(buf, self._offset(seq))
+            if slot_seq != seq:
+                self.lost += 1
+                self.cursor += 1
+                continue
+            if part:
+                # The rest of a frame whose start was skipped after lapping
+                self.cursor += 1
+                continue
+            self.cursor = seq + parts
+            if parts == 1:
+                view = self._read_part(seq)
+                frame = None  # overwritten since the header check: counted as lost below
+                if view is not None:
+                    with view:
+                        frame = str(view, "utf-8", "replace")
+            else:
+                chunks = []
+                for part_seq in range(seq, seq + parts):
+                    view = self._read_part(part_seq)
+                    if view is None:
+                        break
+                    with view:
+                        chunks.append(bytes(view))
+                frame = b"".join(chunks).decode("utf-8", "replace") if len(chunks) == parts else None
+            # Re-check after copying: the writer may have lapped us mid-read
+            if frame is not None and all(self._still_holds(part_seq) for part_seq in range(seq, seq + parts)):
+                frames.append(frame)
+            else:
+                self.lost += 1
+        return frames
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            resource_tracker.register(self.shm._name, "shared_memory")  # unlink() unregisters it again
+            self.shm.unlink()
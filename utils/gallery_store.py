@@ -0,0 +1,297 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger('iris')
+
+
+def write_atomic(path: str, data: str):
+    """Write a file via temp file + fsync + rename so readers never see a partial write"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    # Persist the rename itself
+    dir_fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+class GalleryStore:
+    """In-memory gallery backed by a JSON snapshot and an append-only mutation journal
+
+    Every journal entry is idempotent (inserts and imports skip known ids, votes
+    record absolute totals), so replaying a journal on top of a snapshot that
+    already contains some of its entries is harmless.
+
+    Mutations hand their journal appends to a single dedicated I/O thread,
+    which keeps appends and compactions in submission order without blocking
+    the loop, and change memory only once the append is on disk, so a failed
+    write leaves the store as it was and the caller can simply retry.
+    """
+
+    def __init__(self,
+                 snapshot_file: str = "data/gallery_data.json",
+                 journal_file: str = "data/gallery_journal.jsonl",
+                 compact_every: int = 500):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        self.compact_every = compact_every
+        self.items: List[Dict[str, Any]] = []  # newest first, same order as the snapshot
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._revisions: Dict[str, int] = {}  # version of each item's last non-vote change
+        self._encoded: Dict[str, Tuple[int, int, bytes]] = {}
+        self._digests: Dict[str, Tuple[int, str]] = {}
+        self._journal = None
+        self._journal_entries = 0
+        self.version = 0  # bumped on every applied mutation
+        self.total_pixels = 0  # sum of pixel_count, kept current so startup needn't rescan the gallery
+        self.modified_at = time.time()
+        self.writable = False  # until loaded, so closing a store that failed to load never overwrites the files
+        self.on_mutation: Optional[Callable[[Dict[str, Any]], None]] = None  # called with each new entry
+        self.io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="iris-io")
+
+    async def run_io(self, func, *args):
+        """Run a blocking call on the store's I/O thread"""
+        return await asyncio.get_running_loop().run_in_executor(self.io, func, *args)
+
+    def load(self, writable: bool = True):
+        """Load the snapshot and replay the journal tail written since the last compaction
+
+        A read-only load (a replica in another worker) never touches the files;
+        it is kept current with replicate().
+        """
+        os.makedirs(os.path.dirname(self.snapshot_file) or ".", exist_ok=True)
+        items = []
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, "r") as f:
+                items = json.load(f)
+            self.modified_at = os.path.getmtime(self.snapshot_file)
+
+        # Reloading starts revisions at the current version so cached renders never match stale content
+        self.version += 1
+        self.items = []
+        self._index = {}
+        self._revisions = {}
+        self._encoded = {}
+        self._digests = {}
+        self.total_pixels = 0
+        rekeyed = self._rekey_duplicates(items)
+        for item in items:
+            item_id = str(item["id"])
+            self._index[item_id] = item
+            self._revisions[item_id] = self.version
+            self.items.append(item)
+            self.total_pixels += item.get("pixel_count", 0)
+
+        replayed = 0
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash mid-append
+                        continue
+                    self._apply(entry)
+                    replayed += 1
+
+        self._journal_entries = replayed
+        logger.info(f"Loaded gallery with {len(self.items)} items ({replayed} journal entries replayed)")
+
+        self.writable = writable
+        if not writable:
+            return
+        if replayed or rekeyed or not os.path.exists(self.snapshot_file):
+            self._write_snapshot(self.items)
+        else:
+            self._open_journal()
+
+    @staticmethod
+    def _rekey_duplicates(items: List[Dict[str, Any]]) -> int:
+        """Give every record without a unique id one of its own, so none is dropped on compaction
+
+        The first record keeps the id; later ones become "<id>_2", "<id>_3", ...
+        (remembering the original in duplicate_of). Snapshot order decides, so
+        every worker loading the same snapshot picks the same ids.
+        """
+        taken = {str(item.get("id", "")) for item in items}
+        seen = set()
+        rekeyed = 0
+        for item in items:
+            item_id = str(item.get("id", ""))
+            if item_id and item_id not in seen:
+                seen.add(item_id)
+                continue
+            base = item_id or "item"
+            suffix = 2
+            while f"{base}_{suffix}" in taken:
+                suffix += 1
+            new_id = f"{base}_{suffix}"
+            taken.add(new_id)
+            seen.add(new_id)
+            item["id"] = new_id
+            if item_id:
+                item["duplicate_of"] = item_id
+            rekeyed += 1
+        if rekeyed:
+            logger.warning(f"Gave {rekeyed} gallery records with duplicate or missing ids new ids")
+        return rekeyed
+
+    def _open_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_file, "a")
+
+    def _append_line(self, line: str):
+        self._journal.write(line)
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    async def _commit(self, entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Journal an entry, then apply it to memory and pass it on to replicas"""
+        # Serialize on the loop so the line reflects the entry as it was submitted
+        line = json.dumps(entry) + "\n"
+        await self.run_io(self._append_line, line)
+        added = self._apply(entry)
+        if self.on_mutation is not None:
+            self.on_mutation(entry)
+        self._journal_entries += 1
+        if self._journal_entries >= self.compact_every:
+            await self.compact()
+        return added
+
+    def _apply(self, entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+        op = entry.get("op")
+        added = []
+        self.version += 1
+        self.modified_at = time.time()
+        if op in ("insert", "import"):
+            for item in entry.get("items") or [entry.get("item")]:
+                item_id = str(item.get("id", ""))
+                if item_id and item_id not in self._index:
+                    self._index[item_id] = item
+                    self._revisions[item_id] = self.version
+                    self.total_pixels += item.get("pixel_count", 0)
+                    added.append(item)
+            if op == "insert":
+                self.items[:0] = added
+            elif added:
+                self.items.extend(added)
+                self.items.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
+        elif op == "vote":
+            for item_id, votes in entry.get("votes", {}).items():
+                if item_id in self._index:
+                    self._index[item_id]["votes"] = votes
+        elif op == "update":
+            item = self._index.get(str(entry.get("id")))
+            if item is not None:
+                fields = entry.get("fields", {})
+                if "pixel_count" in fields:
+                    self.total_pixels += fields["pixel_count"] - item.get("pixel_count", 0)
+                item.update(fields)
+                self._revisions[item["id"]] = self.version
+        return added
+
+    def replicate(self, entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Apply an entry journaled by another process, returning any added items"""
+        return self._apply(entry)
+
+    def get(self, item_id: str) -> Optional[Dict[str, Any]]:
+        return self._index.get(str(item_id))
+
+    def revision(self, item_id: str) -> int:
+        """Version at which an item's content (anything but votes) last changed"""
+        return self._revisions.get(str(item_id), 0)
+
+    def digest(self, item_id: str) -> str:
+        """Hash of an item's content (anything but votes), the same in every process holding it"""
+        item_id = str(item_id)
+        revision = self._revisions.get(item_id, 0)
+        cached = self._digests.get(item_id)
+        if cached is not None and cached[0] == revision:
+            return cached[1]
+        item = self._index.get(item_id)
+        if item is None:
+            return ""
+        content = json.dumps({key: value for key, value in item.items() if key != "votes"}, sort_keys=True)
+        digest = hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
+        self._digests[item_id] = (revision, digest)
+        return digest
+
+    def encode_item(self, item: Dict[str, Any], votes: int, remember: bool = True) -> bytes:
+        """JSON-encode an item with the given vote total, reusing the last encoding if unchanged
+
+        remember=False still reuses a cached encoding but doesn't add one, for
+        one-off passes over the whole archive such as streaming an export.
+        """
+        item_id = str(item["id"])
+        revision = self._revisions.get(item_id, 0)
+        cached = self._encoded.get(item_id)
+        if cached is not None and cached[0] == revision and cached[1] == votes:
+            return cached[2]
+        data = json.dumps(dict(item, votes=votes)).encode()
+        if remember:
+            self._encoded[item_id] = (revision, votes, data)
+        return data
+
+    def __contains__(self, item_id: str) -> bool:
+        return str(item_id) in self._index
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    async def insert(self, item: Dict[str, Any]):
+        """Add a new item at the front of the gallery"""
+        await self._commit({"op": "insert", "item": item})
+
+    async def update(self, item_id: str, fields: Dict[str, Any]):
+        """Change fields of an existing item"""
+        await self._commit({"op": "update", "id": str(item_id), "fields": fields})
+
+    async def set_votes(self, votes: Dict[str, int]):
+        """Store absolute vote totals, so persisting the same totals twice is harmless"""
+        votes = {item_id: total for item_id, total in votes.items() if item_id in self._index}
+        if votes:
+            await self._commit({"op": "vote", "votes": votes})
+
+    async def import_items(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Merge items from a backup, returning the ones that were new"""
+        new_items = [item for item in items if str(item.get("id", "")) not in self._index]
+        if not new_items:
+            return []
+        return await self._commit({"op": "import", "items": new_items})
+
+    def _write_snapshot(self, items: List[Dict[str, Any]]):
+        write_atomic(self.snapshot_file, json.dumps(items, indent=2))
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        # Entries are idempotent, so a crash between these two steps only means a redundant replay
+        write_atomic(self.journal_file, "")
+        self._open_journal()
+        logger.info(f"Compacted gallery snapshot ({len(items)} items)")
+
+    async def compact(self):
+        """Fold the journal into a fresh snapshot and start an empty journal"""
+        # Copy on the loop; appends queued after this run after the compaction on the I/O thread
+        items = [dict(item) for item in self.items]
+        self._journal_entries = 0
+        await self.run_io(self._write_snapshot, items)
+
+    async def close(self):
+        """Compact, release the journal and stop the I/O thread"""
+        if self.writable:
+            await self.compact()
+            await self.run_io(self._journal.close)
+            self._journal = None
+        self.io.shutdown(wait=True)
@@ -0,0 +1,56 @@
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, Iterable, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+def content_digest(chunks: Iterable[bytes]) -> str:
+    """Short hash of some content, for validators every worker and restart agree on"""
+    digest = hashlib.blake2b(digest_size=8)
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_etag(*parts: Any) -> str:
+    """Build a strong ETag from components derived from the content, never from per-process counters"""
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def cache_headers(etag: str, last_modified: Optional[float] = None,
+                  cache_control: str = "no-cache") -> Dict[str, str]:
+    """Validator headers for a response; no-cache makes clients revalidate every time"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    return headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[float] = None) -> bool:
+    """Evaluate If-None-Match or, only when it is absent, If-Modified-Since
+
+    The ETag decides whenever the client sent one, and is what catches
+    changes within the same second. HTTP dates have whole second resolution,
+    so the date is compared at that resolution: a client echoing back our
+    Last-Modified has an unchanged copy.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since
+    return False
+
+
+def not_modified_response(etag: str, last_modified: Optional[float] = None,
+                          cache_control: str = "no-cache") -> Response:
+    return Response(status_code=304, headers=cache_headers(etag, last_modified, cache_control))
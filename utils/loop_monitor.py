@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from utils.metrics import Counter, Histogram
+
+logger = logging.getLogger('iris')
+
+
+class LoopMonitor:
+    """Measures event loop scheduling lag and samples the stack of whatever blocks the loop
+
+    A task sleeps for interval and records how late it wakes up. A watchdog
+    thread watches that task's heartbeat; once the loop has been stuck for
+    longer than threshold it grabs the loop thread's current stack, which is
+    the blocking call and the coroutine that made it, and logs it once per stall.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25, stack_limit: int = 12,
+                 histogram: Optional[Histogram] = None, stalls_counter: Optional[Counter] = None):
+        self.interval = interval
+        self.threshold = threshold
+        self.stack_limit = stack_limit
+        self.histogram = histogram
+        self.stalls_counter = stalls_counter
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.last_stall: Optional[Dict[str, Any]] = None
+        self.is_running = False
+        self._beat = time.monotonic()
+        self._sampled_beat = 0.0
+        self._loop_thread: Optional[int] = None
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self.is_running = True
+        threading.Thread(target=self._watch, name="loop-monitor", daemon=True).start()
+        while self.is_running:
+            self._beat = time.monotonic()
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            if self.histogram is not None:
+                self.histogram.observe(lag)
+            if lag > self.threshold:
+                self.stalls += 1
+                if self.stalls_counter is not None:
+                    self.stalls_counter.inc()
+                if self._sampled_beat != self._beat:
+                    # Slipped between watchdog checks, so there is no stack to show
+                    logger.warning(f"Event loop lagged {lag * 1000:.0f}ms")
+
+    def _watch(self):
+        while self.is_running:
+            time.sleep(self.threshold / 2)
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked <= self.threshold or self._sampled_beat == beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            self._sampled_beat = beat
+            stack = traceback.extract_stack(frame, limit=self.stack_limit)
+            where = stack[-1] if stack else None
+            self.last_stall = {
+                "at": datetime.now().isoformat(),
+                "blocked_ms": round(blocked * 1000),
+                "where": f"{where.filename}:{where.lineno} in {where.name}" if where else None
+            }
+            logger.warning(
+                f"Event loop blocked for over {blocked * 1000:.0f}ms, currently in:\n"
+                + "".join(traceback.format_list(stack))
+            )
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "lag_ms": round(self.lag * 1000, 1),
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "stalls": self.stalls,
+            "last_stall": self.last_stall
+        }
+
+    def stop(self):
+        self.is_running = False
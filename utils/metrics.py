@@ -0,0 +1,233 @@
+import functools
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; spans a websocket send up to a slow model call
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """A named family of samples, one per combination of label values"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing total"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        super().__init__(name, description, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterator[str]:
+        for key, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    """Value that goes up and down, set directly or read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, description, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.function = function  # unlabelled gauges only
+
+    def set(self, value: float, **labels):
+        self.values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> Iterator[str]:
+        if self.function is not None:
+            yield f"{self.name} {_format_value(self.function())}"
+            return
+        for key, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    """Distribution of observations over fixed buckets
+
+    observe() is one dict lookup, a bisect and two additions; cumulative bucket
+    counts are only computed when the histogram is rendered.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+        self.series: Dict[Tuple[str, ...], List[float]] = {}  # per-bucket counts, then sum and count
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [0] * (len(self.buckets) + 3)
+        series[bisect_left(self.buckets, value)] += 1  # the slot after the last bucket is +Inf
+        series[-2] += value
+        series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block, including any awaits inside it"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels):
+        """Decorator observing the duration of every call of a coroutine function"""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return await func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, **labels) -> int:
+        series = self.series.get(self._key(labels))
+        return int(series[-1]) if series else 0
+
+    def samples(self) -> Iterator[str]:
+        for key, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {_format_value(cumulative)}"
+            labels = _format_labels(self.label_names, key)
+            yield f"{self.name}_sum{labels} {_format_value(series[-2])}"
+            yield f"{self.name}_count{labels} {_format_value(series[-1])}"
+
+
+class MetricsRegistry:
+    """Creates metrics and renders them in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, description, labels))
+
+    def gauge(self, name: str, description: str, labels: Sequence[str] = (),
+              function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._register(Gauge(name, description, labels, function))
+
+    def histogram(self, name: str, description: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, description, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording HTTP request latency per route template and status
+
+    Latency is measured up to the start of the response, so long-lived streams
+    such as Server-Sent Events count their time to first byte, not their lifetime.
+    """
+
+    def __init__(self, app, histogram: Histogram):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        recorded = False
+
+        def record(status: int):
+            nonlocal recorded
+            recorded = True
+            route = scope.get("route")
+            self.histogram.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status
+            )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and not recorded:
+                record(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if not recorded:
+                record(500)
+            raise
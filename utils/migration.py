@@ -0,0 +1,167 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger('iris')
+
+
+class GalleryMigration:
+    """Uploads legacy gallery files (items with a local filename but no URL) in the background
+
+    Items that already have a URL are skipped, so a run can be started any
+    number of times and picks up wherever the last one stopped. Uploads run
+    concurrency at a time. Each finished upload is appended to a checkpoint
+    file before its URL is journaled to the store. If the process dies
+    between the two, the next run takes the URL from the checkpoint instead
+    of uploading the file again. The checkpoint is cleared at the end of
+    each run, when all of its URLs are in the store.
+    """
+
+    def __init__(self,
+                 store,
+                 upload: Callable[[str, str], Awaitable[str]],
+                 checkpoint_file: str = "data/migration_checkpoint.jsonl",
+                 gallery_dir: str = "static/gallery",
+                 concurrency: int = 4,
+                 on_migrated: Optional[Callable[[str], None]] = None):
+        self.store = store
+        self.upload = upload  # (file path, item id) -> URL
+        self.checkpoint_file = checkpoint_file
+        self.gallery_dir = gallery_dir
+        self.concurrency = max(1, concurrency)
+        self.on_migrated = on_migrated
+        self.task: Optional[asyncio.Task] = None
+        self._reset()
+
+    def _reset(self):
+        self.state = "idle"
+        self.total = 0
+        self.migrated = 0
+        self.resumed = 0  # migrated from the checkpoint without uploading again
+        self.failed = 0
+        self.missing = 0  # no local file to upload
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def pending(self) -> List[Dict[str, Any]]:
+        return [item for item in self.store.items if "filename" in item and not item.get("url")]
+
+    def _load_checkpoint(self) -> Dict[str, str]:
+        uploaded = {}
+        if os.path.exists(self.checkpoint_file):
+            with open(self.checkpoint_file, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash mid-append
+                        continue
+                    uploaded[str(entry["id"])] = entry["url"]
+        return uploaded
+
+    def _record(self, item_id: str, url: str):
+        with open(self.checkpoint_file, "a") as f:
+            f.write(json.dumps({"id": item_id, "url": url}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _clear_checkpoint(self):
+        if os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
+
+    def start(self) -> asyncio.Task:
+        """Start a run, or return the one already in progress"""
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        return self.task
+
+    async def stop(self):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def run(self):
+        self._reset()
+        items = self.pending()
+        if not items:
+            await asyncio.to_thread(self._clear_checkpoint)
+            return
+        self.state = "running"
+        self.total = len(items)
+        self.started_at = time.time()
+        logger.info(f"Migrating {self.total} legacy gallery items ({self.concurrency} uploads at a time)")
+        try:
+            uploaded = await asyncio.to_thread(self._load_checkpoint)
+            remaining = []
+            for item in items:
+                url = uploaded.get(str(item["id"]))
+                if url:
+                    await self._finish(item, url)
+                    self.resumed += 1
+                else:
+                    remaining.append(item)
+
+            # Workers share one iterator, so at most `concurrency` uploads are in flight
+            queue = iter(remaining)
+
+            async def worker():
+                for item in queue:
+                    await self._migrate(item)
+
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(remaining)))))
+            # Every checkpointed URL is in the store's journal by now
+            await asyncio.to_thread(self._clear_checkpoint)
+            self.state = "failed" if self.failed else "done"
+            logger.info(f"Gallery migration {self.state}: {self.migrated} migrated "
+                        f"({self.resumed} from checkpoint), {self.failed} failed, {self.missing} missing files")
+        except asyncio.CancelledError:
+            self.state = "stopped"
+            raise
+        except Exception as e:
+            self.state = "failed"
+            logger.error(f"Error migrating gallery data: {e}")
+        finally:
+            self.finished_at = time.time()
+
+    async def _migrate(self, item: Dict[str, Any]):
+        item_id = str(item["id"])
+        filepath = os.path.join(self.gallery_dir, item["filename"])
+        if not os.path.exists(filepath):
+            self.missing += 1
+            return
+        try:
+            url = await self.upload(filepath, item_id)
+            await asyncio.to_thread(self._record, item_id, url)
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Error migrating item {item_id}: {e}")
+            return
+        await self._finish(item, url)
+
+    async def _finish(self, item: Dict[str, Any], url: str):
+        await self.store.update(item["id"], {"url": url})
+        self.migrated += 1
+        if self.on_migrated is not None:
+            self.on_migrated(str(item["id"]))
+
+    def status(self) -> Dict[str, Any]:
+        done = self.migrated + self.failed + self.missing
+        return {
+            "state": self.state,
+            "total": self.total,
+            "migrated": self.migrated,
+            "resumed": self.resumed,
+            "failed": self.failed,
+            "missing": self.missing,
+            "remaining": self.total - done,
+            "progress": round(done / self.total, 3) if self.total else 1.0,
+            "concurrency": self.concurrency,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import logging
+import os
+import random
+from typing import Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger('iris')
+
+# What the generator asks the model for; replay files are keyed by these
+KINDS = ("idea", "instructions", "reflection")
+
+DEFAULT_MODEL = "claude-3-sonnet-20240229"
+
+
+class ModelResponse(NamedTuple):
+    text: str
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+
+
+class ModelError(Exception):
+    """A model call failed (including injected failures)"""
+
+
+class ModelProvider:
+    """Produces the generator's idea, instruction and reflection completions"""
+
+    name = "base"
+    model: Optional[str] = None
+
+    async def complete(self, kind: str, prompt: str, system: str, max_tokens: int,
+                       temperature: float) -> ModelResponse:
+        raise NotImplementedError
+
+
+class AnthropicProvider(ModelProvider):
+    """Anthropic Messages API; the blocking SDK call runs in a worker thread
+
+    The SDK takes about a second to import, so it is loaded with the client
+    on the first call rather than at startup.
+    """
+
+    name = "anthropic"
+
+    def __init__(self, api_key: str, model: str = DEFAULT_MODEL):
+        self.api_key = api_key
+        self.model = model
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from anthropic import Anthropic
+            self._client = Anthropic(api_key=self.api_key)
+        return self._client
+
+    def _create(self, **kwargs):
+        # Runs in the worker thread, so the first call imports the SDK off the event loop
+        return self.client.messages.create(**kwargs)
+
+    async def complete(self, kind: str, prompt: str, system: str, max_tokens: int,
+                       temperature: float) -> ModelResponse:
+        message = await asyncio.to_thread(
+            self._create,
+            model=self.model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            system=system,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        usage = getattr(message, "usage", None)
+        return ModelResponse(
+            message.content[0].text,
+            getattr(usage, "input_tokens", None),
+            getattr(usage, "output_tokens", None)
+        )
+
+
+class ReplayProvider(ModelProvider):
+    """Serves recorded responses offline, with optional latency and failure injection
+
+    A replay file holds one {"kind": ..., "text": ...} object per line, as
+    written by RecordingProvider. Each kind is replayed in file order and
+    wraps around. Latency, jitter and failures come from a seeded random
+    generator, so a run with the same settings replays identically.
+    """
+
+    name = "replay"
+    model = "replay"
+
+    def __init__(self, path: str, latency: float = 0.0, jitter: float = 0.0,
+                 failure_rate: float = 0.0, seed: int = 0):
+        self.path = path
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.responses: Dict[str, List[ModelResponse]] = {kind: [] for kind in KINDS}
+        self._cursors: Dict[str, int] = {kind: 0 for kind in KINDS}
+        self.calls = 0
+        self.failures = 0
+        self._load()
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get("kind") not in self.responses:
+                    raise ValueError(f"{self.path}:{number}: unknown response kind {record.get('kind')!r}")
+                text = record["text"]
+                if not isinstance(text, str):
+                    text = json.dumps(text)  # instructions may be recorded as objects
+                self.responses[record["kind"]].append(
+                    ModelResponse(text, record.get("input_tokens"), record.get("output_tokens")))
+        missing = [kind for kind, responses in self.responses.items() if not responses]
+        if missing:
+            raise ValueError(f"Replay file {self.path} has no {', '.join(missing)} responses")
+
+    async def complete(self, kind: str, prompt: str, system: str, max_tokens: int,
+                       temperature: float) -> ModelResponse:
+        self.calls += 1
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.failure_rate and self.random.random() < self.failure_rate:
+            self.failures += 1
+            raise ModelError(f"Injected {kind} failure")
+        responses = self.responses[kind]
+        response = responses[self._cursors[kind] % len(responses)]
+        self._cursors[kind] += 1
+        return response
+
+
+class RecordingProvider(ModelProvider):
+    """Wraps a provider and appends each response to a replay file"""
+
+    def __init__(self, inner: ModelProvider, path: str):
+        self.inner = inner
+        self.path = path
+        self.name = f"{inner.name}+recording"
+        self.model = inner.model
+
+    async def complete(self, kind: str, prompt: str, system: str, max_tokens: int,
+                       temperature: float) -> ModelResponse:
+        response = await self.inner.complete(kind, prompt, system, max_tokens, temperature)
+        record = {"kind": kind, "text": response.text,
+                  "input_tokens": response.input_tokens, "output_tokens": response.output_tokens}
+        try:
+            await asyncio.to_thread(self._append, json.dumps(record) + "\n")
+        except OSError as e:
+            logger.error(f"Error recording model response: {e}")
+        return response
+
+    def _append(self, line: str):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def create_provider(name: str, api_key: Optional[str] = None, replay_file: Optional[str] = None,
+                    latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0,
+                    seed: int = 0, record_file: Optional[str] = None) -> ModelProvider:
+    """Build the configured provider ("anthropic" or "replay")"""
+    if name == "anthropic":
+        provider = AnthropicProvider(api_key)
+    elif name == "replay":
+        provider = ReplayProvider(replay_file, latency=latency, jitter=jitter,
+                                  failure_rate=failure_rate, seed=seed)
+    else:
+        raise ValueError(f"Unknown model provider {name!r}")
+    if record_file:
+        provider = RecordingProvider(provider, record_file)
+    return provider
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import math
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Dict, Any, List, Optional, Tuple
+
+from utils.replay import compile_commands
+
+logger = logging.getLogger('iris')
+
+PREVIEW_FORMATS = {
+    "gif": ("GIF", "image/gif"),
+    "png": ("PNG", "image/png")  # animated PNG
+}
+
+
+def _color(value: Any, default: str = "#00ff00") -> Tuple[int, int, int]:
+    from PIL import ImageColor
+    try:
+        return ImageColor.getrgb(value)[:3]
+    except (ValueError, TypeError, AttributeError):
+        return ImageColor.getrgb(default)
+
+
+def render_preview(instructions: Dict[str, Any], fmt: str = "gif", scale: float = 0.5,
+                   max_frames: int = 60, hold_ms: int = 2000) -> bytes:
+    """Render the drawing process as an animated GIF/APNG (runs in a worker process)"""
+    from PIL import Image, ImageDraw  # imported here so only the render workers load Pillow
+    width, height = int(800 * scale), int(400 * scale)
+    commands = compile_commands(instructions)
+    total_segments = sum(1 for cmd, _ in commands if cmd["type"] == "draw")
+    segments_per_frame = max(1, math.ceil(total_segments / max_frames))
+
+    canvas = Image.new("RGB", (width, height), _color(instructions.get("background"), "#000000"))
+    pen = ImageDraw.Draw(canvas)
+    frames: List[Image.Image] = [canvas.copy()]
+    durations: List[int] = [100]
+
+    position = None
+    color = _color(None)
+    stroke = 2
+    pending_segments = 0
+    pending_delay = 0.0
+
+    # Each frame is the previous canvas plus only the segments drawn since then
+    for cmd, delay in commands:
+        if cmd["type"] == "startDrawing":
+            position = (cmd["x"] * scale, cmd["y"] * scale)
+            color = _color(cmd.get("color"))
+            stroke = max(1, round(cmd.get("width", 2) * scale))
+        elif cmd["type"] == "draw" and position is not None:
+            target = (cmd["x"] * scale, cmd["y"] * scale)
+            pen.line([position, target], fill=color, width=stroke)
+            position = target
+            pending_segments += 1
+            pending_delay += delay
+            if pending_segments >= segments_per_frame:
+                frames.append(canvas.copy())
+                durations.append(max(20, int(pending_delay * 1000)))
+                pending_segments = 0
+                pending_delay = 0.0
+        elif cmd["type"] == "stopDrawing":
+            position = None
+
+    frames.append(canvas.copy())
+    durations.append(hold_ms)
+
+    pil_format, _ = PREVIEW_FORMATS[fmt]
+    if pil_format == "GIF":
+        frames = [frame.convert("P", palette=Image.Palette.ADAPTIVE) for frame in frames]
+
+    buffer = BytesIO()
+    frames[0].save(
+        buffer,
+        format=pil_format,
+        save_all=True,
+        append_images=frames[1:],
+        duration=durations,
+        loop=0,
+        optimize=True
+    )
+    return buffer.getvalue()
+
+
+class PreviewRenderer:
+    """Renders animated previews in a process pool and caches them per artwork"""
+
+    def __init__(self, cache_dir: str = "data/previews", max_items: int = 32, max_workers: int = 2):
+        self.cache_dir = cache_dir
+        self.max_items = max_items
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, artwork_id: str, fmt: str) -> str:
+        return os.path.join(self.cache_dir, f"{artwork_id}.{fmt}")
+
+    def _remember(self, key: Tuple[str, str], data: bytes):
+        self._cache[key] = data
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.max_items:
+            self._cache.popitem(last=False)
+
+    def _read_disk(self, path: str) -> Optional[bytes]:
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return f.read()
+        return None
+
+    def _write_disk(self, path: str, data: bytes):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    async def get(self, artwork_id: str, item: Dict[str, Any], fmt: str = "gif") -> Optional[bytes]:
+        """Return preview bytes for an artwork, rendering them off the event loop if needed"""
+        key = (artwork_id, fmt)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        instructions = item.get("instructions")
+        if not instructions or not instructions.get("elements"):
+            return None
+
+        # Concurrent requests for the same preview share one render, run as its own task so
+        # it still completes for the others if the request that started it is cancelled
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._render(key, artwork_id, instructions, fmt))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    async def _render(self, key: Tuple[str, str], artwork_id: str,
+                      instructions: Dict[str, Any], fmt: str) -> bytes:
+        loop = asyncio.get_running_loop()
+        path = self._path(artwork_id, fmt)
+        data = await loop.run_in_executor(None, self._read_disk, path)
+        if data is None:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            logger.info(f"Rendering {fmt} preview for {artwork_id}")
+            data = await loop.run_in_executor(self._executor, render_preview, instructions, fmt)
+            await loop.run_in_executor(None, self._write_disk, path, data)
+        self._remember(key, data)
+        return data
+
+    def _finished(self, key: Tuple[str, str], task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # mark retrieved in case every requester went away
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,46 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger('iris')
+
+
+class RenderCache:
+    """Versioned cache of rendered response bodies with single-flight rendering
+
+    Rendering runs in a worker thread, and concurrent misses for the same key wait
+    for one render instead of each serializing the gallery again.
+    """
+
+    def __init__(self, max_items: int = 256):
+        self.max_items = max_items
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Any]]" = OrderedDict()
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+
+    def peek(self, key: Hashable, version: Any):
+        """Return the cached body if it matches the version, without rendering"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(key)
+            return entry[1]
+        return None
+
+    async def get(self, key: Hashable, version: Any, render: Callable[[], Any]) -> Any:
+        """Return the body for key at version, rendering it off the loop on a miss"""
+        body = self.peek(key, version)
+        if body is not None:
+            return body
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            body = self.peek(key, version)
+            if body is not None:
+                return body
+            body = await asyncio.to_thread(render)
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_items:
+                evicted, _ = self._entries.popitem(last=False)
+                self._locks.pop(evicted, None)
+            return body
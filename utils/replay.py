@@ -0,0 +1,83 @@
+import json
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger('iris')
+
+
+def compile_commands(instructions: Dict[str, Any]) -> List[Tuple[Dict[str, Any], float]]:
+    """Turn stored drawing instructions into (command, delay) pairs using the live protocol"""
+    commands = [
+        ({"type": "clear"}, 0.0),
+        ({"type": "setBackground", "color": instructions.get("background", "#000000")}, 0.0)
+    ]
+
+    for element in instructions.get("elements", []):
+        points = element.get("points") or []
+        if not points:
+            continue
+
+        commands.append(({
+            "type": "startDrawing",
+            "x": points[0][0],
+            "y": points[0][1],
+            "color": element.get("color", "#00ff00"),
+            "width": element.get("stroke_width", 2),
+            "element_description": element.get("description", "")
+        }, 0.0))
+
+        delay = element.get("animation_speed", 0.02)
+        for x, y in points[1:]:
+            commands.append(({"type": "draw", "x": x, "y": y}, delay))
+
+        if element.get("closed", False) and len(points) > 2:
+            commands.append(({"type": "draw", "x": points[0][0], "y": points[0][1]}, 0.0))
+
+        commands.append(({"type": "stopDrawing"}, 0.0))
+
+    return commands
+
+
+class ReplayStream:
+    """Pre-encoded frames for one artwork, shared by every viewer replaying it"""
+
+    def __init__(self, artwork_id: str, instructions: Dict[str, Any]):
+        self.artwork_id = artwork_id
+        commands = compile_commands(instructions)
+        self.frames: List[str] = [json.dumps(cmd) for cmd, _ in commands]
+        self.delays: List[float] = [delay for _, delay in commands]
+        self.header = json.dumps({
+            "type": "replay_start",
+            "drawing_id": artwork_id,
+            "frames": len(self.frames),
+            "duration": round(sum(self.delays), 3)
+        })
+        self.footer = json.dumps({"type": "replay_complete", "drawing_id": artwork_id})
+
+
+class ReplayCache:
+    """Small LRU of compiled replay streams keyed by artwork id"""
+
+    def __init__(self, max_items: int = 64):
+        self.max_items = max_items
+        self._streams: "OrderedDict[str, ReplayStream]" = OrderedDict()
+
+    def get(self, artwork_id: str, item: Dict[str, Any]) -> Optional[ReplayStream]:
+        """Return the cached stream for an artwork, compiling it on first use"""
+        stream = self._streams.get(artwork_id)
+        if stream is not None:
+            self._streams.move_to_end(artwork_id)
+            return stream
+
+        instructions = item.get("instructions")
+        if not instructions or not instructions.get("elements"):
+            return None
+
+        stream = ReplayStream(artwork_id, instructions)
+        self._streams[artwork_id] = stream
+        if len(self._streams) > self.max_items:
+            self._streams.popitem(last=False)
+
+        logger.info(f"Compiled replay stream for {artwork_id} ({len(stream.frames)} frames)")
+        return stream
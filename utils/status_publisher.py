@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger('iris')
+
+# Fields that change continuously while drawing; they may wait for the next tick
+COALESCED = frozenset({"progress", "total_pixels", "viewers"})
+
+
+class StatusPublisher:
+    """Sends display_update messages carrying only the fields that changed
+
+    The latest value of every field is kept and compared against what viewers
+    were last sent. Phase, status, idea and reflection changes go out at once;
+    a change that only touches coalesced fields is held back until
+    min_interval has passed since the previous update, so a burst of progress
+    values collapses into the most recent one.
+    """
+
+    def __init__(self, broadcast: Callable[[Dict[str, Any]], Awaitable[None]], min_interval: float = 0.25):
+        self.broadcast = broadcast
+        self.min_interval = min_interval
+        self.state: Dict[str, Any] = {}  # latest value of every field
+        self.sent: Dict[str, Any] = {}   # values viewers have been sent
+        self.sent_updates = 0
+        self.coalesced_updates = 0
+        self._last_sent = 0.0
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _changes(self) -> Dict[str, Any]:
+        return {field: value for field, value in self.state.items()
+                if field not in self.sent or self.sent[field] != value}
+
+    async def update(self, **fields):
+        """Record new field values and publish whatever changed, subject to the rate cap"""
+        if fields.get("progress") is not None:
+            fields["progress"] = round(fields["progress"], 1)
+        self.state.update(fields)
+        changes = self._changes()
+        if not changes:
+            return
+
+        wait = self._last_sent + self.min_interval - asyncio.get_running_loop().time()
+        if wait > 0 and COALESCED.issuperset(changes):
+            self.coalesced_updates += 1
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.create_task(self._flush_later(wait))
+            return
+        await self.flush()
+
+    async def _flush_later(self, delay: float):
+        await asyncio.sleep(delay)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Error publishing status update: {e}")
+
+    async def flush(self):
+        """Send all pending changes now"""
+        changes = self._changes()
+        if not changes:
+            return
+        self.sent.update(changes)
+        self._last_sent = asyncio.get_running_loop().time()
+        self.sent_updates += 1
+        await self.broadcast({
+            "type": "display_update",
+            **changes,
+            "timestamp": datetime.now().isoformat()
+        })
+
+    def mirror(self, fields: Dict[str, Any]):
+        """Adopt values another worker has already sent to viewers"""
+        fields = {field: value for field, value in fields.items() if field not in ("type", "timestamp")}
+        self.state.update(fields)
+        self.sent.update(fields)
+
+    def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
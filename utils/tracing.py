@@ -0,0 +1,141 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger('iris')
+
+
+class Span:
+    """One timed operation within a trace"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "attributes", "error",
+                 "_started", "_token", "_ended")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.attributes = dict(attributes or {})
+        self.error: Optional[str] = None
+        self._started = time.perf_counter()
+        self._token: Optional[contextvars.Token] = None
+        self._ended = False
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error: BaseException):
+        self.error = f"{type(error).__name__}: {error}"
+
+
+class Tracer:
+    """Records spans of the creative cycle and appends them to a JSONL file
+
+    The current span follows the task through awaits (a context variable), so
+    nested calls become children without passing spans around. Finished spans
+    are written by a single background thread, one JSON object per line, and
+    a trace can be resumed from another task by passing its span as parent.
+    An empty path disables export; spans are still created but go nowhere.
+    """
+
+    def __init__(self, path: Optional[str] = "logs/traces.jsonl"):
+        self.path = path
+        self._current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("iris_span", default=None)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-writer") if path else None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def current(self) -> Optional[Span]:
+        return self._current.get()
+
+    def start_span(self, name: str, parent: Optional[Span] = None, new_trace: bool = False, **attributes) -> Span:
+        """Open a span under parent (default: the current span) and make it current"""
+        if parent is None and not new_trace:
+            parent = self._current.get()
+        if parent is None:
+            span = Span(name, secrets.token_hex(16), None, attributes)
+        else:
+            span = Span(name, parent.trace_id, parent.span_id, attributes)
+        span._token = self._current.set(span)
+        return span
+
+    def end_span(self, span: Span):
+        """Close a span, restore its parent as current and export it"""
+        if span._ended:
+            return
+        span._ended = True
+        duration = time.perf_counter() - span._started
+        try:
+            self._current.reset(span._token)
+        except ValueError:
+            pass  # ended from another context, which never saw it as current
+        if self._writer is None:
+            return
+        record = {
+            "trace_id": span.trace_id,
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            "name": span.name,
+            "start": round(span.start, 6),
+            "duration_ms": round(duration * 1000, 3),
+            "attributes": span.attributes,
+            "error": span.error
+        }
+        try:
+            self._writer.submit(self._write, json.dumps(record, default=str) + "\n")
+        except RuntimeError:
+            pass  # shut down
+
+    def _write(self, line: str):
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            logger.error(f"Error writing trace span: {e}")
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, **attributes):
+        span = self.start_span(name, parent, **attributes)
+        try:
+            yield span
+        except Exception as e:
+            span.fail(e)
+            raise
+        finally:
+            self.end_span(span)
+
+    def traced(self, name: str):
+        """Decorator running every call of a coroutine function in its own span"""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return await func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def annotate(self, **attributes):
+        """Add attributes to the current span, if any"""
+        span = self._current.get()
+        if span is not None:
+            span.set(**attributes)
+
+    def record_error(self, error: BaseException):
+        """Mark the current span failed for an error that was handled rather than raised"""
+        span = self._current.get()
+        if span is not None:
+            span.fail(error)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
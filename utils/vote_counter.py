@@ -0,0 +1,215 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, Any, List, Optional, Set, Callable, Awaitable
+
+logger = logging.getLogger('iris')
+
+
+class VoteCounter:
+    """In-memory vote totals with a write-behind journal and batched persistence
+
+    Votes only ever go up, so both the journal and persistence deal in
+    absolute totals: replaying a journal line or persisting a batch again
+    (after a failed write, or a crash before the journal segment was retired)
+    can never count a vote twice.
+    """
+
+    def __init__(self,
+                 persist: Callable[[Dict[str, int]], Awaitable[None]],
+                 broadcast: Callable[[Dict[str, Any]], Awaitable[None]],
+                 journal_file: str = "data/votes.journal",
+                 flush_interval: float = 2.0,
+                 broadcast_interval: float = 0.25,
+                 batch_size: int = 100):
+        self.persist = persist
+        self.broadcast = broadcast
+        self.journal_file = journal_file
+        self.flushing_file = f"{journal_file}.flushing"
+        self.flush_interval = flush_interval
+        self.broadcast_interval = broadcast_interval
+        self.batch_size = batch_size
+
+        self.counts: Dict[str, int] = {}   # live totals served to clients
+        self.pending: Dict[str, int] = {}  # votes per item not yet persisted
+        self.changed: Set[str] = set()     # ids with a vote_update still to broadcast
+        self.version = 0                   # bumped on every counted vote
+        self.modified_at = 0.0
+        self.is_running = False
+
+        self._journal = None
+        self._journal_dirty = False
+        self._last_flush = time.monotonic()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+
+    def seed(self, items: List[Dict[str, Any]]):
+        """Take totals from the gallery as stored, without touching the journal"""
+        self.counts = {str(item["id"]): int(item.get("votes", 0)) for item in items if "id" in item}
+        self.version += 1
+
+    def load(self, items: List[Dict[str, Any]]):
+        """Seed totals from the gallery and replay any votes left in the journal"""
+        self.seed(items)
+        stored = dict(self.counts)
+
+        replayed = 0
+        for path in (self.flushing_file, self.journal_file):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash mid-append
+                        continue
+                    item_id = str(entry.get("id"))
+                    if item_id not in self.counts:
+                        continue
+                    if "votes" in entry:
+                        # A total the gallery may already have persisted; never count it twice
+                        self.counts[item_id] = max(self.counts[item_id], int(entry["votes"]))
+                    else:
+                        self.counts[item_id] += int(entry.get("delta", 1))  # journal from an older version
+                    replayed += 1
+        for item_id, total in self.counts.items():
+            if total > stored[item_id]:
+                self.pending[item_id] = total - stored[item_id]
+
+        # Consolidate recovered votes (dropping any torn tail) before accepting new ones
+        if replayed or os.path.exists(self.journal_file):
+            tmp_file = f"{self.journal_file}.tmp"
+            with open(tmp_file, "w") as f:
+                for item_id in self.pending:
+                    f.write(json.dumps({"id": item_id, "votes": self.counts[item_id]}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.journal_file)
+        if self.pending:
+            logger.info(f"Recovered {sum(self.pending.values())} unflushed votes from journal")
+        if os.path.exists(self.flushing_file):
+            os.remove(self.flushing_file)
+        self._open_journal()
+
+    def _open_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_file, "a")
+
+    def _sync_journal(self):
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._journal_dirty = False
+
+    @staticmethod
+    def _retire_segment(segment):
+        segment.flush()
+        os.fsync(segment.fileno())
+        segment.close()
+
+    def track(self, item_id: str, votes: int = 0):
+        """Start counting votes for a newly added item"""
+        self.counts.setdefault(str(item_id), int(votes))
+
+    def get(self, item_id: str, default: int = 0) -> int:
+        return self.counts.get(str(item_id), default)
+
+    def mirror(self, item_id: str, votes: int):
+        """Adopt a live total counted by another process"""
+        self.counts[str(item_id)] = int(votes)
+        self.version += 1
+        self.modified_at = time.time()
+
+    def increment(self, item_id: str) -> Optional[int]:
+        """Record one vote and return the new total, or None for unknown items"""
+        item_id = str(item_id)
+        if item_id not in self.counts:
+            return None
+
+        self.counts[item_id] += 1
+        self._journal.write(json.dumps({"id": item_id, "votes": self.counts[item_id]}) + "\n")
+        self._journal.flush()
+        self._journal_dirty = True
+
+        self.version += 1
+        self.modified_at = time.time()
+        self.pending[item_id] = self.pending.get(item_id, 0) + 1
+        self.changed.add(item_id)
+
+        if sum(self.pending.values()) >= self.batch_size:
+            self._wakeup.set()
+        return self.counts[item_id]
+
+    async def broadcast_changes(self):
+        """Send one vote_update per image that changed since the last tick"""
+        changed, self.changed = self.changed, set()
+        for item_id in changed:
+            await self.broadcast({
+                "type": "vote_update",
+                "image_id": item_id,
+                "votes": self.counts[item_id]
+            })
+
+    async def flush(self):
+        """Persist the totals of items with pending votes and retire the journal segment they came from"""
+        loop = asyncio.get_running_loop()
+        async with self._flush_lock:
+            self._last_flush = time.monotonic()
+            if not self.pending:
+                if self._journal_dirty:
+                    await loop.run_in_executor(None, self._sync_journal)
+                return
+
+            deltas, self.pending = self.pending, {}
+            # Rotate so votes arriving during persistence land in a fresh segment
+            segment = self._journal
+            os.replace(self.journal_file, self.flushing_file)
+            self._journal = open(self.journal_file, "a")
+            self._journal_dirty = False
+            await loop.run_in_executor(None, self._retire_segment, segment)
+
+            try:
+                # Totals as of now, which may include votes counted while rotating
+                await self.persist({item_id: self.counts[item_id] for item_id in deltas})
+                logger.info(f"Persisted {sum(deltas.values())} votes across {len(deltas)} images")
+            except Exception as e:
+                logger.error(f"Error persisting votes, will retry: {e}")
+                for item_id, delta in deltas.items():
+                    self.pending[item_id] = self.pending.get(item_id, 0) + delta
+                    self._journal.write(json.dumps({"id": item_id, "votes": self.counts[item_id]}) + "\n")
+                await loop.run_in_executor(None, self._sync_journal)
+            finally:
+                os.remove(self.flushing_file)
+
+    async def run(self):
+        """Coalesce broadcasts and flush on interval or batch size"""
+        self.is_running = True
+        while self.is_running:
+            try:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.broadcast_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+                await self.broadcast_changes()
+
+                batch_full = sum(self.pending.values()) >= self.batch_size
+                if batch_full or time.monotonic() - self._last_flush >= self.flush_interval:
+                    await self.flush()
+            except Exception as e:
+                logger.error(f"Error in vote counter loop: {e}")
+                await asyncio.sleep(1)
+
+    async def stop(self):
+        """Flush everything and close the journal"""
+        self.is_running = False
+        self._wakeup.set()
+        await self.broadcast_changes()
+        await self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
@@ -0,0 +1,97 @@
+import hashlib
+import ipaddress
+import logging
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger('iris')
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_networks(specs: Iterable[str]) -> List[Network]:
+    """Parse proxy addresses or CIDR ranges, skipping (and logging) invalid ones"""
+    networks = []
+    for spec in specs:
+        try:
+            networks.append(ipaddress.ip_network(spec.strip(), strict=False))
+        except ValueError:
+            logger.error(f"Ignoring invalid trusted proxy {spec!r}")
+    return networks
+
+
+def _is_trusted(host: Optional[str], trusted: List[Network]) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except (TypeError, ValueError):
+        return False
+    return any(address in network for network in trusted)
+
+
+def client_address(peer: Optional[str], forwarded_for: Optional[str], trusted: List[Network]) -> str:
+    """The address a request came from, honouring X-Forwarded-For only behind trusted proxies
+
+    Each proxy appends the address it received the request from, so hops are
+    read from the right, skipping our own proxies; the first other hop is the
+    client. Anything left of it was supplied by the client and can't be trusted.
+    """
+    if not forwarded_for or not _is_trusted(peer, trusted):
+        return peer or "unknown"
+    for hop in reversed(forwarded_for.split(",")):
+        hop = hop.strip()
+        if hop and not _is_trusted(hop, trusted):
+            return hop
+    return peer or "unknown"
+
+
+class VoteGuard:
+    """Bounded per-client vote deduplication and token-bucket rate limiting"""
+
+    def __init__(self, rate: float = 0.2, burst: int = 10,
+                 max_clients: int = 10000, max_votes: int = 100000):
+        self.rate = rate              # tokens refilled per second
+        self.burst = burst            # bucket capacity
+        self.max_clients = max_clients
+        self.max_votes = max_votes
+        # fingerprint -> (tokens, last refill), least recently seen first
+        self._buckets: "OrderedDict[bytes, Tuple[float, float]]" = OrderedDict()
+        # digest of (fingerprint, image id) for votes already counted
+        self._voted: "OrderedDict[bytes, None]" = OrderedDict()
+
+    @staticmethod
+    def fingerprint(address: str, user_agent: Optional[str] = None) -> bytes:
+        """Derive a compact client key from the address (see client_address) and user agent"""
+        return hashlib.blake2b(f"{address}|{user_agent or ''}".encode(), digest_size=12).digest()
+
+    @staticmethod
+    def _vote_key(fingerprint: bytes, image_id: str) -> bytes:
+        return hashlib.blake2b(fingerprint + str(image_id).encode(), digest_size=12).digest()
+
+    def has_voted(self, fingerprint: bytes, image_id: str) -> bool:
+        return self._vote_key(fingerprint, image_id) in self._voted
+
+    def take_token(self, fingerprint: bytes) -> float:
+        """Consume one token; returns 0 on success or the seconds until one is available"""
+        now = time.monotonic()
+        tokens, last = self._buckets.pop(fingerprint, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / self.rate
+
+        self._buckets[fingerprint] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+    def remember(self, fingerprint: bytes, image_id: str):
+        """Record a counted vote so repeats from the same client are rejected"""
+        key = self._vote_key(fingerprint, image_id)
+        self._voted[key] = None
+        self._voted.move_to_end(key)
+        if len(self._voted) > self.max_votes:
+            self._voted.popitem(last=False)